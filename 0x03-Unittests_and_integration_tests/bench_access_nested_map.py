@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Compare access_nested_map with compiled paths on scaled up repo payloads"""
+
+import sys
+import timeit
+
+from client import GithubOrgClient
+from fixtures import TEST_PAYLOAD
+from utils import access_nested_map, compile_path, extract_paths
+
+LICENSE_PATH = ("license", "key")
+PATHS = [("name",), ("owner", "login"), LICENSE_PATH]
+
+
+def scaled_repos(factor: int) -> list:
+    """The fixture repos repeated `factor` times"""
+    return TEST_PAYLOAD[0][1] * factor
+
+
+def per_call(repos: list) -> list:
+    """One access_nested_map call per path and repo"""
+    rows = []
+    for repo in repos:
+        row = []
+        for path in PATHS:
+            try:
+                row.append(access_nested_map(repo, path))
+            except KeyError:
+                row.append(None)
+        rows.append(tuple(row))
+    return rows
+
+
+def compiled(repos: list) -> list:
+    """Getters compiled once, applied to every repo"""
+    getters = [compile_path(path) for path in PATHS]
+    rows = []
+    for repo in repos:
+        row = []
+        for getter in getters:
+            try:
+                row.append(getter(repo))
+            except KeyError:
+                row.append(None)
+        rows.append(tuple(row))
+    return rows
+
+
+def batched(repos: list) -> list:
+    """extract_paths over the whole list"""
+    return extract_paths(repos, PATHS, default=None)
+
+
+def has_license(repos: list) -> list:
+    """The public_repos filter as it used to be written"""
+    return [repo for repo in repos if GithubOrgClient.has_license(repo, "apache-2.0")]
+
+
+def compiled_license(repos: list) -> list:
+    """The same filter with a compiled license getter"""
+    get_license = compile_path(LICENSE_PATH)
+
+    def license_of(repo):
+        try:
+            return get_license(repo)
+        except KeyError:
+            return None
+
+    return [repo for repo in repos if license_of(repo) == "apache-2.0"]
+
+
+def main(factor: int = 10000, repeat: int = 5) -> None:
+    """Time every variant on the same payload and print the best run"""
+    repos = scaled_repos(factor)
+    assert per_call(repos) == compiled(repos) == batched(repos)
+    assert has_license(repos) == compiled_license(repos)
+
+    print(f"{len(repos)} repos, {len(PATHS)} paths, best of {repeat}")
+    baseline = None
+    for func in (per_call, compiled, batched, has_license, compiled_license):
+        best = min(timeit.repeat(lambda: func(repos), number=1, repeat=repeat))
+        if func in (per_call, has_license):
+            baseline = best
+        print(f"{func.__name__:>17}: {best * 1000:8.1f}ms  x{baseline / best:.2f}")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
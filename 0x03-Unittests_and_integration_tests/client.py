@@ -1,26 +1,134 @@
 #!/usr/bin/env python3
 """A github org client"""
 
+import asyncio
+import heapq
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from typing import (
+    Iterable,
+    Iterator,
     List,
     Dict,
+    Mapping,
+    Tuple,
+    Union,
 )
+from urllib.parse import parse_qs, urlencode, urlsplit, urlunsplit
+
+from requests.utils import parse_header_links
 
 from utils import (
     get_json,
+    get_json_page,
     access_nested_map,
+    async_get_json,
+    async_get_json_page,
+    async_memoize,
+    compile_path,
+    enable_disk_cache,
     memoize,
+    stream_json_page,
 )
 
 
+class RateLimit:
+    """Track the X-RateLimit headers and wait for the reset once spent"""
+
+    def __init__(self) -> None:
+        """Init method of RateLimit"""
+        self.remaining = None
+        self.reset_at = None
+        self._lock = threading.Lock()
+
+    def update(self, headers: Mapping) -> None:
+        """Record the budget reported by a response"""
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset_at = headers.get("X-RateLimit-Reset")
+        with self._lock:
+            if remaining is not None:
+                self.remaining = int(remaining)
+            if reset_at is not None:
+                self.reset_at = int(reset_at)
+
+    def wait(self) -> None:
+        """Sleep until the reset time when no request is left"""
+        with self._lock:
+            if self.remaining != 0 or self.reset_at is None:
+                return
+            delay = self.reset_at - time.time()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def parse_links(headers: Mapping) -> Dict[str, str]:
+    """Map the rel of each Link header entry to its URL"""
+    return {
+        link["rel"]: link["url"]
+        for link in parse_header_links(headers.get("Link", ""))
+        if "rel" in link and "url" in link
+    }
+
+
+def page_url(url: str, page: int, per_page: int) -> str:
+    """URL of one page of a list, keeping a per_page already in the URL"""
+    scheme, netloc, path, query, fragment = urlsplit(url)
+    params = parse_qs(query)
+    params.setdefault("per_page", [str(per_page)])
+    params["page"] = [str(page)]
+    return urlunsplit((scheme, netloc, path, urlencode(params, doseq=True), fragment))
+
+
+def last_page(links: Mapping[str, str]) -> int:
+    """Number of the last page, or None without a last link"""
+    if "last" not in links:
+        return None
+    return int(parse_qs(urlsplit(links["last"]).query)["page"][0])
+
+
+def build_license_index(repos: List[Dict]) -> Dict[str, List[int]]:
+    """Map each license key to the positions of its repos in the payload"""
+    get_license = compile_path(("license", "key"))
+    index: Dict[str, List[int]] = {}
+    for position, repo in enumerate(repos):
+        try:
+            license_key = get_license(repo)
+        except KeyError:
+            continue
+        index.setdefault(license_key, []).append(position)
+    return index
+
+
+def select_repos(
+    repos: List[Dict],
+    index: Dict[str, List[int]],
+    license: Union[str, Iterable[str]] = None,
+) -> List[str]:
+    """Names of the repos with one of the licenses, in payload order"""
+    if license is None:
+        return [repo["name"] for repo in repos]
+    if isinstance(license, str):
+        positions = index.get(license, [])
+    else:
+        # Each list is already sorted, so merging keeps the payload order
+        positions = heapq.merge(*(index.get(key, []) for key in set(license)))
+    return [repos[position]["name"] for position in positions]
+
+
 class GithubOrgClient:
     """A Githib org client"""
 
     ORG_URL = "https://api.github.com/orgs/{org}"
+    PER_PAGE = 100
+    MAX_WORKERS = 4
 
     def __init__(self, org_name: str) -> None:
         """Init method of GithubOrgClient"""
         self._org_name = org_name
+        self._rate_limit = RateLimit()
 
     @memoize
     def org(self) -> Dict:
@@ -32,21 +140,104 @@ class GithubOrgClient:
         """Public repos URL"""
         return self.org["repos_url"]
 
+    def _get_page(self, url: str):
+        """Get one page of repos, respecting the rate limit"""
+        self._rate_limit.wait()
+        payload, headers = get_json_page(url)
+        self._rate_limit.update(headers)
+        return payload, headers
+
+    def _iter_repo_pages(self) -> Iterator[List[Dict]]:
+        """Pages of repos, in order.
+        The first page tells through its Link header how many pages there are,
+        the others are then fetched MAX_WORKERS at a time.
+        """
+        repos_url = self._public_repos_url
+        payload, headers = self._get_page(page_url(repos_url, 1, self.PER_PAGE))
+        yield payload
+
+        links = parse_links(headers)
+        if last_page(links) is not None:
+            urls = [
+                page_url(repos_url, page, self.PER_PAGE)
+                for page in range(2, last_page(links) + 1)
+            ]
+            # A window of MAX_WORKERS pages fetched ahead, in page order.
+            # Not executor.map: it submits every page up front, and a caller
+            # that stops early would wait for all of them to download
+            executor = ThreadPoolExecutor(max_workers=self.MAX_WORKERS)
+            pending = deque()
+            try:
+                for url in urls:
+                    pending.append(executor.submit(self._get_page, url))
+                    if len(pending) == self.MAX_WORKERS:
+                        yield pending.popleft().result()[0]
+                while pending:
+                    yield pending.popleft().result()[0]
+            finally:
+                executor.shutdown(cancel_futures=True)
+            return
+
+        # Without a last link, follow the next links one by one
+        while "next" in links:
+            payload, headers = self._get_page(links["next"])
+            yield payload
+            links = parse_links(headers)
+
     @memoize
-    def repos_payload(self) -> Dict:
+    def repos_payload(self) -> List[Dict]:
         """Memoize repos payload"""
-        return get_json(self._public_repos_url)
+        return [repo for page in self._iter_repo_pages() for repo in page]
 
-    def public_repos(self, license: str = None) -> List[str]:
-        """Public repos"""
+    @property
+    def license_index(self) -> Dict[str, List[int]]:
+        """License key -> positions in repos_payload.
+        Built once per payload: a new payload, after the memoized one was
+        deleted or expired, gets a new index.
+        """
         json_payload = self.repos_payload
-        public_repos = [
-            repo["name"]
-            for repo in json_payload
-            if license is None or self.has_license(repo, license)
-        ]
+        cached = getattr(self, "_license_index", None)
+        if cached is None or cached[0] is not json_payload:
+            cached = (json_payload, build_license_index(json_payload))
+            self._license_index = cached
+        return cached[1]
 
-        return public_repos
+    def _stream_repo_fields(self, fields: List[Tuple]) -> Iterator[Tuple]:
+        """Fields of each repo, parsed while the pages download one by one"""
+        url = page_url(self._public_repos_url, 1, self.PER_PAGE)
+        while url is not None:
+            self._rate_limit.wait()
+            rows, headers = stream_json_page(url, fields)
+            self._rate_limit.update(headers)
+            yield from rows
+            url = parse_links(headers).get("next")
+
+    def iter_public_repos(
+        self, license: Union[str, Iterable[str]] = None, stream: bool = False
+    ) -> Iterator[str]:
+        """Public repos, yielded as each page arrives.
+        With stream=True the pages are parsed as they download and only the
+        name and license of each repo are kept, for very large orgs.
+        """
+        licenses = [license] if isinstance(license, str) else license
+        if stream:
+            licenses = None if licenses is None else set(licenses)
+            fields = [("name",), ("license", "key")]
+            for name, license_key in self._stream_repo_fields(fields):
+                if licenses is None or license_key in licenses:
+                    yield name
+            return
+
+        for page in self._iter_repo_pages():
+            for repo in page:
+                if licenses is None or any(
+                    self.has_license(repo, key) for key in licenses
+                ):
+                    yield repo["name"]
+
+    def public_repos(self, license: Union[str, Iterable[str]] = None) -> List[str]:
+        """Public repos, with any of the given licenses"""
+        return select_repos(self.repos_payload, self.license_index, license)
 
     @staticmethod
     def has_license(repo: Dict[str, Dict], license_key: str) -> bool:
@@ -59,7 +250,105 @@ class GithubOrgClient:
         return has_license
 
 
+class AsyncGithubOrgClient:
+    """A Github org client for asyncio code.
+    Requests run in worker threads over the shared session of utils,
+    so many clients can wait on the network at the same time.
+    """
+
+    ORG_URL = GithubOrgClient.ORG_URL
+    PER_PAGE = GithubOrgClient.PER_PAGE
+    MAX_WORKERS = GithubOrgClient.MAX_WORKERS
+
+    def __init__(self, org_name: str) -> None:
+        """Init method of AsyncGithubOrgClient"""
+        self._org_name = org_name
+        self._rate_limit = RateLimit()
+
+    @async_memoize
+    async def org(self) -> Dict:
+        """Memoize org"""
+        return await async_get_json(self.ORG_URL.format(org=self._org_name))
+
+    async def _get_page(self, url: str):
+        """Get one page of repos, respecting the rate limit"""
+        await asyncio.to_thread(self._rate_limit.wait)
+        payload, headers = await async_get_json_page(url)
+        self._rate_limit.update(headers)
+        return payload, headers
+
+    @async_memoize
+    async def repos_payload(self) -> List[Dict]:
+        """Memoize repos payload, fetching the pages MAX_WORKERS at a time"""
+        repos_url = (await self.org)["repos_url"]
+        payload, headers = await self._get_page(page_url(repos_url, 1, self.PER_PAGE))
+        pages = [payload]
+
+        links = parse_links(headers)
+        if last_page(links) is not None:
+            semaphore = asyncio.Semaphore(self.MAX_WORKERS)
+
+            async def get_page(page: int) -> List[Dict]:
+                async with semaphore:
+                    payload, _ = await self._get_page(
+                        page_url(repos_url, page, self.PER_PAGE)
+                    )
+                return payload
+
+            pages += await asyncio.gather(
+                *(get_page(page) for page in range(2, last_page(links) + 1))
+            )
+        else:
+            while "next" in links:
+                payload, headers = await self._get_page(links["next"])
+                pages.append(payload)
+                links = parse_links(headers)
+
+        return [repo for page in pages for repo in page]
+
+    async def license_index(self) -> Dict[str, List[int]]:
+        """License key -> positions in repos_payload, built once per payload"""
+        json_payload = await self.repos_payload
+        cached = getattr(self, "_license_index", None)
+        if cached is None or cached[0] is not json_payload:
+            cached = (json_payload, build_license_index(json_payload))
+            self._license_index = cached
+        return cached[1]
+
+    async def public_repos(
+        self, license: Union[str, Iterable[str]] = None
+    ) -> List[str]:
+        """Public repos, with any of the given licenses"""
+        return select_repos(
+            await self.repos_payload, await self.license_index(), license
+        )
+
+
+async def fetch_orgs(
+    org_names: Iterable[str], concurrency: int = 10
+) -> Dict[str, Tuple[Dict, List[Dict]]]:
+    """Fetch the org and repos payloads of many orgs concurrently.
+    At most `concurrency` orgs are fetched at a time, so the whole run takes
+    about as long as its slowest orgs instead of the sum of all of them.
+    Returns {org_name: (org, repos_payload)} in the order of org_names.
+    """
+    semaphore = asyncio.BoundedSemaphore(concurrency)
+
+    async def fetch(org_name: str) -> Tuple[Dict, List[Dict]]:
+        async with semaphore:
+            client = AsyncGithubOrgClient(org_name)
+            return await client.org, await client.repos_payload
+
+    org_names = list(org_names)
+    results = await asyncio.gather(*(fetch(org_name) for org_name in org_names))
+    return dict(zip(org_names, results))
+
+
 if __name__ == "__main__":
-    client = GithubOrgClient("google")
+    # Responses are kept on disk, so running this again only fetches changes
+    enable_disk_cache()
+    client = GithubOrgClient(sys.argv[1] if len(sys.argv) > 1 else "google")
     print(client.has_license({"license": {"key": "my_license"}}, "my_license"))
     print(client.has_license({"license": {"key": "other_license"}}, "my_license"))
+    if len(sys.argv) > 1:
+        print(client.public_repos())
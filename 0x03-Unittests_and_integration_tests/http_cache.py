@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""On-disk cache of JSON responses, shared between runs and processes."""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from typing import Mapping, Optional
+
+DEFAULT_CACHE_FILE = os.path.join(
+    os.path.expanduser("~"), ".cache", "github_org_client.sqlite"
+)
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# payload is the decoded JSON, expires_at a time.time() or None to always revalidate
+CacheEntry = namedtuple("CacheEntry", ["etag", "payload", "headers", "expires_at"])
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+def expires_at(headers: Mapping, now: float = None) -> Optional[float]:
+    """Expiry time from the Cache-Control max-age of a response, if any"""
+    cache_control = headers.get("Cache-Control", "")
+    if "no-cache" in cache_control or "no-store" in cache_control:
+        return None
+    match = _MAX_AGE.search(cache_control)
+    if match is None:
+        return None
+    return (time.time() if now is None else now) + int(match.group(1))
+
+
+def is_storable(headers: Mapping) -> bool:
+    """Whether a response may be kept: it can be revalidated or is fresh a while"""
+    if "no-store" in headers.get("Cache-Control", ""):
+        return False
+    return bool(headers.get("ETag")) or expires_at(headers) is not None
+
+
+class DiskCache:
+    """JSON responses keyed by URL in a SQLite file.
+    Several processes can share the file, and the least recently used
+    entries are dropped once the stored bodies exceed max_bytes.
+    """
+
+    def __init__(
+        self, path: str = DEFAULT_CACHE_FILE, max_bytes: int = DEFAULT_MAX_BYTES
+    ) -> None:
+        """Init method of DiskCache"""
+        self.path = path
+        self.max_bytes = max_bytes
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode = WAL")
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    url TEXT PRIMARY KEY,
+                    etag TEXT,
+                    headers TEXT NOT NULL,
+                    body TEXT NOT NULL,
+                    expires_at REAL,
+                    size INTEGER NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+                """
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed_at"
+                " ON responses (accessed_at)"
+            )
+
+    def get(self, url: str) -> Optional[CacheEntry]:
+        """Cached entry for a URL, or None"""
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT etag, headers, body, expires_at FROM responses WHERE url = ?",
+                (url,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._connection.execute(
+                "UPDATE responses SET accessed_at = ? WHERE url = ?",
+                (time.time(), url),
+            )
+        etag, headers, body, expires = row
+        return CacheEntry(etag, json.loads(body), json.loads(headers), expires)
+
+    def set(self, url: str, entry: CacheEntry) -> None:
+        """Store an entry, then evict the oldest ones when over max_bytes"""
+        headers = json.dumps(dict(entry.headers))
+        body = json.dumps(entry.payload)
+        size = len(headers) + len(body)
+        if size > self.max_bytes:
+            return
+
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, entry.etag, headers, body, entry.expires_at, size, time.time()),
+            )
+            total = self._connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            oldest = self._connection.execute(
+                "SELECT url, size FROM responses WHERE url != ? ORDER BY accessed_at",
+                (url,),
+            ).fetchall()
+            evicted = []
+            for old_url, old_size in oldest:
+                if total <= self.max_bytes:
+                    break
+                evicted.append((old_url,))
+                total -= old_size
+            self._connection.executemany(
+                "DELETE FROM responses WHERE url = ?", evicted
+            )
+
+    def refresh(self, url: str, headers: Mapping, expires: Optional[float]) -> None:
+        """Record a 304 answer: new headers and expiry for the same body"""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "UPDATE responses SET headers = ?, expires_at = ?, accessed_at = ?"
+                " WHERE url = ?",
+                (json.dumps(dict(headers)), expires, time.time(), url),
+            )
+
+    def size(self) -> int:
+        """Bytes taken by the stored headers and bodies"""
+        with self._lock:
+            return self._connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()[0]
+
+    def clear(self) -> None:
+        """Drop every entry"""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM responses")
+
+    def close(self) -> None:
+        """Close the database file"""
+        with self._lock:
+            self._connection.close()
@@ -1,9 +1,20 @@
 #!/usr/bin/env python3
 """A github org client"""
 
+import asyncio
+import json
+import threading
+import time
 import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from unittest.mock import PropertyMock, patch, Mock
-from client import GithubOrgClient
+from urllib.parse import parse_qs, urlsplit
+from client import (
+    AsyncGithubOrgClient,
+    GithubOrgClient,
+    build_license_index,
+    fetch_orgs,
+)
 from parameterized import parameterized, parameterized_class
 from fixtures import TEST_PAYLOAD
 
@@ -68,10 +79,10 @@ class TestGithubOrgClient(unittest.TestCase):
             # Check that the mock was called once
             mock_client.assert_called_once()
 
-    @patch("client.get_json")
+    @patch("client.get_json_page")
     def test_public_repos(self, mock_json):
         """
-        Use @patch as a decorator to mock get_json
+        Use @patch as a decorator to mock get_json_page
         and make it return a payload of your choice.
         Use patch as a context manager to mock
         GithubOrgClient._public_repos_url and
@@ -84,7 +95,8 @@ class TestGithubOrgClient(unittest.TestCase):
             {"name": "repo3"},
         ]
 
-        mock_json.return_value = payload
+        # A single page: no Link header to follow
+        mock_json.return_value = (payload, {})
         base_url = "https://api.github.com/orgs/test"
 
         # Patch _public_repos_url property
@@ -102,8 +114,8 @@ class TestGithubOrgClient(unittest.TestCase):
             # _public_repos_url property called once
             mock_url.assert_called_once()
 
-            # get_json called once with the mocked URL
-            mock_json.assert_called_once_with(base_url)
+            # get_json_page called once with the first page of the mocked URL
+            mock_json.assert_called_once_with(base_url + "?per_page=100&page=1")
 
     @parameterized.expand(  # type: ignore
         [
@@ -120,6 +132,42 @@ class TestGithubOrgClient(unittest.TestCase):
         result = GithubOrgClient.has_license(repo_name, license_key)
         self.assertEqual(result, expected)
 
+    @patch("client.get_json_page")
+    def test_public_repos_license_index(self, mock_json):
+        """
+        Test that the license index is built once per payload and
+        answers single and multi-license queries in payload order.
+        """
+        payload = [
+            {"name": "repo1", "license": {"key": "mit"}},
+            {"name": "repo2", "license": None},
+            {"name": "repo3", "license": {"key": "apache-2.0"}},
+            {"name": "repo4"},
+            {"name": "repo5", "license": {"key": "mit"}},
+        ]
+        mock_json.return_value = (payload, {})
+
+        with patch.object(
+            GithubOrgClient, "_public_repos_url", new_callable=PropertyMock
+        ) as mock_url, patch(
+            "client.build_license_index", wraps=build_license_index
+        ) as mock_index:
+            mock_url.return_value = "https://api.github.com/orgs/test"
+            org_client = GithubOrgClient("test")
+
+            self.assertEqual(org_client.public_repos("mit"), ["repo1", "repo5"])
+            self.assertEqual(org_client.public_repos("gpl"), [])
+            self.assertEqual(
+                org_client.public_repos(["mit", "apache-2.0"]),
+                ["repo1", "repo3", "repo5"],
+            )
+            mock_index.assert_called_once()
+
+            # A new payload gets a new index
+            del org_client.repos_payload
+            self.assertEqual(org_client.public_repos("apache-2.0"), ["repo3"])
+            self.assertEqual(mock_index.call_count, 2)
+
 
 @parameterized_class(
     [
@@ -138,17 +186,18 @@ class TestIntegrationGithubOrgClient(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
         """Start patcher for requests.get and set up side_effect for .json()"""
-        cls.get_patcher = patch("requests.get")
+        # get_json goes through a shared requests.Session
+        cls.get_patcher = patch("requests.Session.get")
         cls.mock_get = cls.get_patcher.start()
 
-        def side_effect(url):
+        def side_effect(url, **kwargs):
             # Return a mock with .json() returning the correct payload
-            mock_resp = Mock()
+            mock_resp = Mock(status_code=200, headers={})
             payload = None
 
             if url == GithubOrgClient.ORG_URL.format(org="google"):
                 payload = cls.org_payload
-            elif url == cls.org_payload["repos_url"]:
+            elif url.split("?")[0] == cls.org_payload["repos_url"]:
                 payload = cls.repos_payload
 
             mock_resp.json.return_value = payload
@@ -166,3 +215,206 @@ class TestIntegrationGithubOrgClient(unittest.TestCase):
         """Integration test for public_repos method"""
         client = GithubOrgClient("google")
         self.assertEqual(client.public_repos(), self.expected_repos)
+
+    def test_public_repos_with_license(self):
+        """Integration test for public_repos filtered by license"""
+        client = GithubOrgClient("google")
+        self.assertEqual(client.public_repos("apache-2.0"), self.apache2_repos)
+
+
+class FakeGithubHandler(BaseHTTPRequestHandler):
+    """Local stand-in for the GitHub API serving the fixtures in pages"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        """Serve the org, or one page of its repos with a Link header"""
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            url = urlsplit(self.path)
+            headers = {}
+            if not url.path.endswith("/repos"):
+                payload = {"repos_url": server.base_url + url.path + "/repos"}
+            else:
+                query = parse_qs(url.query)
+                page = int(query["page"][0])
+                per_page = int(query["per_page"][0])
+                last_page = -(-len(server.repos) // per_page)
+                payload = server.repos[(page - 1) * per_page : page * per_page]
+                headers["Link"] = server.link_header(
+                    url.path, page, per_page, last_page
+                )
+                server.pages.append(page)
+                # Leave time for the other page requests to overlap
+                time.sleep(0.02)
+
+            body = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def log_message(self, format, *args):
+        """Keep the test output quiet"""
+
+
+class FakeGithubServer(ThreadingHTTPServer):
+    """Record the pages asked for and how many were served at once"""
+
+    def __init__(self, repos, with_last=True):
+        super().__init__(("127.0.0.1", 0), FakeGithubHandler)
+        self.repos = repos
+        self.with_last = with_last
+        self.base_url = "http://127.0.0.1:{}".format(self.server_port)
+        self.lock = threading.Lock()
+        self.pages = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def link_header(self, path, page, per_page, last_page):
+        """Build the Link header GitHub sends with a page"""
+        url = self.base_url + path + "?per_page={}&page={{}}".format(per_page)
+        links = []
+        if page < last_page:
+            links.append('<{}>; rel="next"'.format(url.format(page + 1)))
+            if self.with_last:
+                links.append('<{}>; rel="last"'.format(url.format(last_page)))
+        return ", ".join(links)
+
+
+class TestPaginatedGithubOrgClient(unittest.TestCase):
+    """Test pagination against a local fake of the GitHub API"""
+
+    repos = TEST_PAYLOAD[0][1] * 10
+    expected_repos = TEST_PAYLOAD[0][2] * 10
+    apache2_repos = TEST_PAYLOAD[0][3] * 10
+
+    def start_server(self, with_last=True):
+        """Start a fake API and point the client at it"""
+        server = FakeGithubServer(self.repos, with_last)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        for client_class in (GithubOrgClient, AsyncGithubOrgClient):
+            org_url = patch.object(
+                client_class, "ORG_URL", server.base_url + "/orgs/{org}"
+            )
+            per_page = patch.object(client_class, "PER_PAGE", 7)
+            for patcher in (org_url, per_page):
+                patcher.start()
+                self.addCleanup(patcher.stop)
+        return server
+
+    def test_public_repos_pages(self):
+        """Every page is fetched once, concurrently but in order"""
+        server = self.start_server()
+        client = GithubOrgClient("google")
+
+        self.assertEqual(client.public_repos(), self.expected_repos)
+        self.assertEqual(client.public_repos("apache-2.0"), self.apache2_repos)
+        self.assertEqual(sorted(server.pages), list(range(1, 14)))
+        self.assertGreater(server.max_in_flight, 1)
+        self.assertLessEqual(server.max_in_flight, GithubOrgClient.MAX_WORKERS)
+
+    def test_iter_public_repos_stop_early(self):
+        """Stopping early leaves the pages past the window unfetched"""
+        server = self.start_server()
+        client = GithubOrgClient("google")
+
+        repos = client.iter_public_repos()
+        first = [next(repos) for _ in range(GithubOrgClient.PER_PAGE + 1)]
+        repos.close()
+
+        self.assertEqual(first, self.expected_repos[: len(first)])
+        self.assertLessEqual(len(server.pages), 1 + GithubOrgClient.MAX_WORKERS)
+
+    def test_public_repos_next_links(self):
+        """Without a last link the next links are followed one at a time"""
+        server = self.start_server(with_last=False)
+        client = GithubOrgClient("google")
+
+        self.assertEqual(list(client.iter_public_repos()), self.expected_repos)
+        self.assertEqual(server.pages, list(range(1, 14)))
+        self.assertEqual(server.max_in_flight, 1)
+
+    @patch("client.time.sleep")
+    @patch("client.get_json_page")
+    def test_rate_limit(self, mock_page, mock_sleep):
+        """The next page waits for the reset once no request is left"""
+        reset_at = int(time.time()) + 60
+        mock_page.side_effect = [
+            (
+                [{"name": "repo1"}],
+                {
+                    "Link": '<https://api.github.com/orgs/test?page=2>; rel="next"',
+                    "X-RateLimit-Remaining": "0",
+                    "X-RateLimit-Reset": str(reset_at),
+                },
+            ),
+            ([{"name": "repo2"}], {"X-RateLimit-Remaining": "4999"}),
+        ]
+
+        with patch.object(
+            GithubOrgClient, "_public_repos_url", new_callable=PropertyMock
+        ) as mock_url:
+            mock_url.return_value = "https://api.github.com/orgs/test"
+            repos = GithubOrgClient("test").public_repos()
+
+        self.assertEqual(repos, ["repo1", "repo2"])
+        mock_sleep.assert_called_once()
+        self.assertAlmostEqual(mock_sleep.call_args[0][0], 60, delta=2)
+
+    def test_iter_public_repos_stream(self):
+        """Streamed pages give the same repos as the parsed ones"""
+        server = self.start_server()
+        client = GithubOrgClient("google")
+
+        self.assertEqual(
+            list(client.iter_public_repos(stream=True)), self.expected_repos
+        )
+        self.assertEqual(
+            list(client.iter_public_repos("apache-2.0", stream=True)),
+            self.apache2_repos,
+        )
+        self.assertEqual(server.pages, list(range(1, 14)) * 2)
+
+    def test_async_public_repos(self):
+        """The async client pages the same way without blocking the loop"""
+        server = self.start_server()
+
+        async def public_repos():
+            client = AsyncGithubOrgClient("google")
+            return (
+                await client.public_repos(),
+                await client.public_repos("apache-2.0"),
+            )
+
+        repos, apache2_repos = asyncio.run(public_repos())
+        self.assertEqual(repos, self.expected_repos)
+        self.assertEqual(apache2_repos, self.apache2_repos)
+        self.assertEqual(sorted(server.pages), list(range(1, 14)))
+        self.assertLessEqual(server.max_in_flight, AsyncGithubOrgClient.MAX_WORKERS)
+
+    def test_fetch_orgs(self):
+        """Many orgs are fetched concurrently, each org and page once"""
+        server = self.start_server()
+        org_names = ["google", "abc", "holberton"]
+
+        results = asyncio.run(fetch_orgs(org_names, concurrency=2))
+
+        self.assertEqual(list(results), org_names)
+        for org_name, (org, repos) in results.items():
+            self.assertTrue(org["repos_url"].endswith(f"/orgs/{org_name}/repos"))
+            self.assertEqual([repo["name"] for repo in repos], self.expected_repos)
+        self.assertEqual(len(server.pages), 13 * len(org_names))
+        self.assertGreater(server.max_in_flight, 1)
@@ -4,13 +4,30 @@ This script contains utility functions for testing purposes.
 It includes function for Unittests and Integration Tests
 """
 
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
 import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from unittest.mock import Mock, patch
 from parameterized import parameterized
 
 access_nested_map = __import__("utils").access_nested_map
+clear_response_cache = __import__("utils").clear_response_cache
+compile_path = __import__("utils").compile_path
+disable_disk_cache = __import__("utils").disable_disk_cache
+enable_disk_cache = __import__("utils").enable_disk_cache
+extract_paths = __import__("utils").extract_paths
+iter_json_array = __import__("utils").iter_json_array
 get_json = __import__("utils").get_json
 memoize = __import__("utils").memoize
+async_memoize = __import__("utils").async_memoize
+DEFAULT_TIMEOUT = __import__("utils").DEFAULT_TIMEOUT
+CacheEntry = __import__("http_cache").CacheEntry
+DiskCache = __import__("http_cache").DiskCache
 
 
 class TestAccessNestedMap(unittest.TestCase):
@@ -48,12 +65,100 @@ class TestAccessNestedMap(unittest.TestCase):
             access_nested_map(nested_map, path)
 
 
+class TestCompilePath(unittest.TestCase):
+    """
+    Test case for compile_path and extract_paths.
+    """
+
+    @parameterized.expand(  # type: ignore
+        [
+            ({"a": 1}, ("a",), 1),
+            ({"a": {"b": 2}}, ("a",), {"b": 2}),
+            ({"a": {"b": 2}}, ("a", "b"), 2),
+            ({"a": {"b": 2}}, (), {"a": {"b": 2}}),
+        ]
+    )
+    def test_compile_path(self, nested_map, path, expected) -> None:
+        """
+        Test that a compiled path returns what access_nested_map returns.
+        """
+        self.assertEqual(compile_path(path)(nested_map), expected)
+
+    @parameterized.expand(  # type: ignore
+        [({}, ("a",)), ({"a": 1}, ("a", "b")), ({"a": "bc"}, ("a", 0))]
+    )
+    def test_compile_path_exception(self, nested_map, path) -> None:
+        """
+        Test that a compiled path raises KeyError like access_nested_map.
+        """
+        with self.assertRaises(KeyError):
+            compile_path(path)(nested_map)
+
+    def test_extract_paths(self) -> None:
+        """
+        Test extracting several paths from every map.
+        """
+        repos = [
+            {"name": "a", "license": {"key": "mit"}},
+            {"name": "b", "license": None},
+        ]
+        paths = [("name",), ("license", "key")]
+
+        self.assertEqual(
+            extract_paths(repos, paths, default=None),
+            [("a", "mit"), ("b", None)],
+        )
+        with self.assertRaises(KeyError):
+            extract_paths(repos, paths)
+
+
+class TestIterJsonArray(unittest.TestCase):
+    """
+    Test case for the iter_json_array function.
+    """
+
+    def test_iter_json_array(self):
+        """
+        Test that every element is parsed whatever the chunk boundaries.
+        """
+        payload = [{"name": "é", "license": None}, 12, -4.5e3, 1e-7, "s", True, []]
+        raw = json.dumps(payload).encode()
+
+        for size in range(1, len(raw) + 1):
+            chunks = [raw[start : start + size] for start in range(0, len(raw), size)]
+            self.assertEqual(list(iter_json_array(chunks)), payload)
+
+    def test_iter_json_array_lazy(self):
+        """
+        Test that elements are yielded before the rest of the data is read.
+        """
+        chunks = iter([b'[{"a": 1},', b' {"a": 2}]'])
+        elements = iter_json_array(chunks)
+
+        self.assertEqual(next(elements), {"a": 1})
+        self.assertEqual(next(chunks), b' {"a": 2}]')
+
+    @parameterized.expand(  # type: ignore
+        [(b'{"a": 1}',), (b"[1, 2",), (b"[1 2]",), (b"",)]
+    )
+    def test_iter_json_array_exception(self, raw):
+        """
+        Test that malformed or truncated arrays raise ValueError.
+        """
+        with self.assertRaises(ValueError):
+            list(iter_json_array([raw]))
+
+
 class TestGetJson(unittest.TestCase):
     """
     Test case for the get_json function.
     """
 
-    def get_url(self, url):
+    def setUp(self):
+        """Start every test without cached responses"""
+        clear_response_cache()
+
+    def get_url(self, url, **kwargs):
         """Return a mock response object with a .json() method
         for the given URL."""
         url_list = {
@@ -62,7 +167,7 @@ class TestGetJson(unittest.TestCase):
         }
 
         # create a mock response object
-        mock_resp = Mock()
+        mock_resp = Mock(status_code=200, headers={})
 
         # set the .json() method to return the corresponding value
         mock_resp.json.return_value = url_list[url]
@@ -81,17 +186,169 @@ class TestGetJson(unittest.TestCase):
         Test getting JSON from a URL.
         """
 
-        with patch("utils.requests.get", side_effect=self.get_url) as mock:
+        with patch("utils.requests.Session.get", side_effect=self.get_url) as mock:
             # Call the get_json function with the URL
             json_response = get_json(url)
 
             # Check that the mock was called with the correct URL
-            mock.assert_called_once_with(url)
+            mock.assert_called_once_with(url, headers={}, timeout=DEFAULT_TIMEOUT)
 
             # Check that the JSON response matches the expected value
             self.assertEqual(json_response, expected_value)
 
 
+class PayloadHandler(BaseHTTPRequestHandler):
+    """Local stand-in for the GitHub API that answers with an ETag"""
+
+    protocol_version = "HTTP/1.1"
+    payload = {"repos_url": "https://api.github.com/orgs/google/repos"}
+    etag = '"v1"'
+    cache_control = None
+
+    def do_GET(self):
+        """Serve the payload, or 304 when the client already has it"""
+        self.server.requests.append(
+            (self.client_address, self.headers.get("If-None-Match"))
+        )
+        if self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.send_header("ETag", self.etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        body = json.dumps(self.payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", self.etag)
+        if self.cache_control:
+            self.send_header("Cache-Control", self.cache_control)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Keep the test output quiet"""
+
+
+class TestGetJsonServer(unittest.TestCase):
+    """
+    Test get_json against a local HTTP server.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """Start the local server"""
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), PayloadHandler)
+        cls.server.requests = []
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.url = "http://127.0.0.1:{}/orgs/google".format(cls.server.server_port)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Stop the local server"""
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        """Start every test without cached responses"""
+        clear_response_cache()
+        self.server.requests.clear()
+
+    def test_conditional_request(self):
+        """
+        Test that the second call sends If-None-Match and reuses the payload.
+        """
+        first = get_json(self.url)
+        second = get_json(self.url)
+
+        self.assertEqual(first, PayloadHandler.payload)
+        self.assertEqual(second, PayloadHandler.payload)
+        self.assertEqual(
+            [etag for _, etag in self.server.requests], [None, PayloadHandler.etag]
+        )
+
+    def test_connection_reuse(self):
+        """
+        Test that consecutive calls go over the same kept-alive connection.
+        """
+        for _ in range(3):
+            get_json(self.url)
+
+        client_addresses = {address for address, _ in self.server.requests}
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(len(client_addresses), 1)
+
+    def test_disk_cache_revalidate(self):
+        """
+        Test that a new run revalidates the ETag kept on disk.
+        """
+        with tempfile.TemporaryDirectory() as cache_dir:
+            enable_disk_cache(os.path.join(cache_dir, "cache.sqlite"))
+            self.addCleanup(disable_disk_cache)
+
+            get_json(self.url)
+            # A new process starts with an empty memory cache
+            clear_response_cache()
+            payload = get_json(self.url)
+
+        self.assertEqual(payload, PayloadHandler.payload)
+        self.assertEqual(
+            [etag for _, etag in self.server.requests], [None, PayloadHandler.etag]
+        )
+
+    def test_disk_cache_max_age(self):
+        """
+        Test that a fresh response on disk is used without any request.
+        """
+        with tempfile.TemporaryDirectory() as cache_dir, patch.object(
+            PayloadHandler, "cache_control", "public, max-age=60"
+        ):
+            path = os.path.join(cache_dir, "cache.sqlite")
+            enable_disk_cache(path)
+            self.addCleanup(disable_disk_cache)
+
+            get_json(self.url)
+            clear_response_cache()
+            enable_disk_cache(path)
+            payload = get_json(self.url)
+
+            self.assertEqual(payload, PayloadHandler.payload)
+            self.assertEqual(len(self.server.requests), 1)
+
+            # Once max-age has passed the response is revalidated
+            with patch("utils.time.time", return_value=time.time() + 61):
+                clear_response_cache()
+                get_json(self.url)
+            self.assertEqual(len(self.server.requests), 2)
+
+
+class TestDiskCache(unittest.TestCase):
+    """
+    Test case for the DiskCache class.
+    """
+
+    def test_eviction(self):
+        """
+        Test that the least recently used entries go once over max_bytes.
+        """
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = DiskCache(os.path.join(cache_dir, "cache.sqlite"), max_bytes=250)
+            self.addCleanup(cache.close)
+            entry = CacheEntry('"v1"', ["x" * 20] * 4, {"ETag": '"v1"'}, None)
+
+            for url in ("a", "b"):
+                cache.set(url, entry)
+            cache.get("a")
+            cache.set("c", entry)
+
+            self.assertIsNotNone(cache.get("a"))
+            self.assertIsNone(cache.get("b"))
+            self.assertIsNotNone(cache.get("c"))
+            self.assertLessEqual(cache.size(), 250)
+
+
 class TestMemoize(unittest.TestCase):
     """
     Test case for the memoize decorator.
@@ -137,3 +394,175 @@ class TestMemoize(unittest.TestCase):
             # Check that the result is cached
             self.assertEqual(result1, 42)
             self.assertEqual(result2, 42)
+
+    def test_memoize_ttl(self):
+        """
+        Test that a memoized value is computed again once the ttl expired.
+        """
+
+        class TestClass:
+            """A class with a memoized property that expires."""
+
+            def a_method(self):
+                """A method that returns a value."""
+                return 42
+
+            @memoize(ttl=10)
+            def a_property(self):
+                """A property memoized for 10 seconds."""
+                return self.a_method()
+
+        usecase = TestClass()
+
+        with patch.object(usecase, "a_method", return_value=42) as mock_get, patch(
+            "utils.time.monotonic", side_effect=[0, 5, 11, 11, 11]
+        ):
+            self.assertEqual(usecase.a_property, 42)
+            self.assertEqual(usecase.a_property, 42)
+            self.assertEqual(mock_get.call_count, 1)
+
+            # After 11 seconds the value is stale and computed again
+            self.assertEqual(usecase.a_property, 42)
+            self.assertEqual(mock_get.call_count, 2)
+
+    def test_memoize_invalidate(self):
+        """
+        Test that deleting a memoized property drops the cached value.
+        """
+
+        class TestClass:
+            """A class with a memoized property."""
+
+            def a_method(self):
+                """A method that returns a value."""
+                return 42
+
+            @memoize
+            def a_property(self):
+                """A memoized property."""
+                return self.a_method()
+
+        usecase = TestClass()
+
+        with patch.object(usecase, "a_method", return_value=42) as mock_get:
+            usecase.a_property
+            del usecase.a_property
+            usecase.a_property
+
+            self.assertEqual(mock_get.call_count, 2)
+
+    def test_memoize_single_computation(self):
+        """
+        Test that concurrent first calls compute the value only once.
+        """
+        calls = []
+
+        class TestClass:
+            """A class with a slow memoized property."""
+
+            @memoize
+            def a_property(self):
+                """A memoized property that takes a while."""
+                calls.append(1)
+                time.sleep(0.05)
+                return 42
+
+        usecase = TestClass()
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(usecase.a_property))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [42] * 8)
+
+    def test_memoize_shared(self):
+        """
+        Test that instances with the same key share a least recently used cache.
+        """
+        calls = []
+
+        class TestClass:
+            """A class whose memoized property is shared by name."""
+
+            def __init__(self, name):
+                self.name = name
+
+            @memoize(shared=True, key=lambda self: self.name, maxsize=2)
+            def a_property(self):
+                """A memoized property shared between instances."""
+                calls.append(self.name)
+                return self.name.upper()
+
+        self.assertEqual(TestClass("a").a_property, "A")
+        self.assertEqual(TestClass("a").a_property, "A")
+        self.assertEqual(calls, ["a"])
+
+        # "b" and "c" push "a" out of the cache
+        TestClass("b").a_property
+        TestClass("c").a_property
+        TestClass("a").a_property
+        self.assertEqual(calls, ["a", "b", "c", "a"])
+
+        with self.assertRaises(ValueError):
+            memoize(shared=True)(lambda self: None)
+
+
+class TestAsyncMemoize(unittest.TestCase):
+    """
+    Test case for the async_memoize decorator.
+    """
+
+    def test_async_memoize(self):
+        """
+        Test that concurrent awaits share one computation.
+        """
+        calls = []
+
+        class TestClass:
+            """A class with a memoized coroutine."""
+
+            @async_memoize
+            async def a_property(self):
+                """A memoized coroutine that takes a while."""
+                calls.append(1)
+                await asyncio.sleep(0.01)
+                return 42
+
+        async def run():
+            usecase = TestClass()
+            results = await asyncio.gather(*(usecase.a_property for _ in range(5)))
+            return results + [await usecase.a_property]
+
+        self.assertEqual(asyncio.run(run()), [42] * 6)
+        self.assertEqual(len(calls), 1)
+
+    def test_async_memoize_retry(self):
+        """
+        Test that a failed computation is not cached.
+        """
+        outcomes = [ValueError("boom"), 42]
+
+        class TestClass:
+            """A class whose memoized coroutine fails once."""
+
+            @async_memoize
+            async def a_property(self):
+                """A memoized coroutine."""
+                outcome = outcomes.pop(0)
+                if isinstance(outcome, Exception):
+                    raise outcome
+                return outcome
+
+        async def run():
+            usecase = TestClass()
+            with self.assertRaises(ValueError):
+                await usecase.a_property
+            return await usecase.a_property
+
+        self.assertEqual(asyncio.run(run()), 42)
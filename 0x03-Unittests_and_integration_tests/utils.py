@@ -1,24 +1,81 @@
 #!/usr/bin/env python3
 """Generic utilities for github org client."""
 
-from functools import wraps
+import asyncio
+import codecs
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache, partial, wraps
 from typing import (
     Mapping,
     Sequence,
     Any,
     Dict,
     Callable,
+    Iterable,
+    Iterator,
+    List,
+    Tuple,
 )
 
 import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from http_cache import (
+    DEFAULT_CACHE_FILE,
+    DEFAULT_MAX_BYTES,
+    CacheEntry,
+    DiskCache,
+    expires_at,
+    is_storable,
+)
 
 
 __all__ = [
     "access_nested_map",
+    "async_get_json",
+    "async_get_json_page",
+    "async_memoize",
+    "clear_response_cache",
+    "compile_path",
+    "disable_disk_cache",
+    "enable_disk_cache",
+    "extract_paths",
+    "iter_json_array",
+    "iter_paths",
     "get_json",
+    "get_json_page",
+    "get_session",
     "memoize",
+    "stream_json",
+    "stream_json_page",
 ]
 
+# (connect, read) timeouts in seconds for get_json
+DEFAULT_TIMEOUT = (3.05, 10)
+POOL_MAXSIZE = 10
+RESPONSE_CACHE_SIZE = 256
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+# Guards the creation of memoize locks and the shared caches
+_memoize_lock = threading.Lock()
+
+_session = None
+_session_lock = threading.Lock()
+
+# url -> CacheEntry of the last responses that had an ETag or a max-age
+_response_cache: OrderedDict = OrderedDict()
+_response_cache_lock = threading.Lock()
+
+# Second level behind _response_cache, kept across runs when enabled
+_disk_cache = None
+
 
 def access_nested_map(nested_map: Mapping, path: Sequence) -> Any:
     """Access nested map with key path.
@@ -42,14 +99,292 @@ def access_nested_map(nested_map: Mapping, path: Sequence) -> Any:
     return nested_map
 
 
-def get_json(url: str) -> Dict:
+@lru_cache(maxsize=256)
+def _compile_path(keys: Tuple) -> Callable[[Mapping], Any]:
+    def getter(nested_map: Mapping) -> Any:
+        for key in keys:
+            # Plain dicts, the usual JSON case, skip the slower ABC check
+            if type(nested_map) is not dict and not isinstance(nested_map, Mapping):
+                raise KeyError(key)
+            nested_map = nested_map[key]
+        return nested_map
+
+    return getter
+
+
+def compile_path(path: Sequence) -> Callable[[Mapping], Any]:
+    """Build a getter for a key path, to call on many maps.
+    The getter behaves like access_nested_map with the path bound, and
+    compiled getters are cached by path.
+    Example
+    -------
+    >>> get_license = compile_path(("license", "key"))
+    >>> get_license({"license": {"key": "mit"}})
+    'mit'
+    """
+    return _compile_path(tuple(path))
+
+
+_MISSING = object()
+
+
+def iter_paths(
+    nested_maps: Iterable[Mapping], paths: Sequence[Sequence], default: Any = _MISSING
+) -> Iterator[Tuple]:
+    """Lazy version of extract_paths, for maps that arrive one at a time."""
+    getters = [compile_path(path) for path in paths]
+    for item in nested_maps:
+        row = []
+        for getter in getters:
+            try:
+                row.append(getter(item))
+            except KeyError:
+                if default is _MISSING:
+                    raise
+                row.append(default)
+        yield tuple(row)
+
+
+def extract_paths(
+    nested_maps: Iterable[Mapping], paths: Sequence[Sequence], default: Any = _MISSING
+) -> List[Tuple]:
+    """Extract several key paths from every map in one pass.
+    Returns one tuple per map with the values in the order of paths.
+    A missing key raises KeyError, unless a default is given for it.
+    Example
+    -------
+    >>> repos = [{"name": "a", "license": {"key": "mit"}}, {"name": "b"}]
+    >>> extract_paths(repos, [("name",), ("license", "key")], default=None)
+    [('a', 'mit'), ('b', None)]
+    """
+    return list(iter_paths(nested_maps, paths, default))
+
+
+def iter_json_array(chunks: Iterable[bytes]) -> Iterator[Any]:
+    """Parse a JSON array from UTF-8 chunks, yielding each element once complete.
+    Only the unparsed tail of the data is kept, so memory stays around one
+    chunk plus one element however long the array is.
+    Example
+    -------
+    >>> list(iter_json_array([b'[{"a": 1}, {"a"', b': 2}]']))
+    [{'a': 1}, {'a': 2}]
+    """
+    chunks = iter(chunks)
+    decode = codecs.getincrementaldecoder("utf-8")().decode
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = "", 0, False
+    # "[" -> "value_or_end" -> ("separator_or_end" -> "value")*
+    state = "["
+
+    while True:
+        pos = _WHITESPACE.match(buffer, pos).end()
+        if pos == len(buffer) or state == "incomplete":
+            if eof:
+                raise ValueError("Unexpected end of JSON array")
+            chunk = next(chunks, None)
+            eof = chunk is None
+            buffer = buffer[pos:] + decode(chunk or b"", final=eof)
+            pos = 0
+            if state == "incomplete":
+                state = "value"
+            continue
+
+        char = buffer[pos]
+        if state == "[":
+            if char != "[":
+                raise ValueError("Expected a JSON array")
+            pos, state = pos + 1, "value_or_end"
+        elif char == "]" and state in ("value_or_end", "separator_or_end"):
+            return
+        elif state == "separator_or_end":
+            if char != ",":
+                raise ValueError("Expected ',' or ']' at position {}".format(pos))
+            pos, state = pos + 1, "value"
+        else:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                state = "incomplete"
+                continue
+            # A number cut by the chunk boundary, like "1." or "2e", decodes
+            # to a shorter number, so wait for the characters that follow it
+            if not eof and (end == len(buffer) or buffer[end] in ".eE+-"):
+                state = "incomplete"
+                continue
+            yield value
+            pos, state = end, "separator_or_end"
+
+
+def get_session() -> requests.Session:
+    """Shared session, so connections are kept alive and reused across calls."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_MAXSIZE, pool_maxsize=POOL_MAXSIZE)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+
+def clear_response_cache() -> None:
+    """Forget the payloads cached in memory."""
+    with _response_cache_lock:
+        _response_cache.clear()
+
+
+def enable_disk_cache(
+    path: str = DEFAULT_CACHE_FILE, max_bytes: int = DEFAULT_MAX_BYTES
+) -> DiskCache:
+    """Also keep responses in a SQLite file, so later runs start warm."""
+    global _disk_cache
+    disable_disk_cache()
+    _disk_cache = DiskCache(path, max_bytes)
+    return _disk_cache
+
+
+def disable_disk_cache() -> None:
+    """Stop using the on-disk cache."""
+    global _disk_cache
+    if _disk_cache is not None:
+        _disk_cache.close()
+        _disk_cache = None
+
+
+def _remember(url: str, entry: CacheEntry) -> None:
+    with _response_cache_lock:
+        _response_cache[url] = entry
+        _response_cache.move_to_end(url)
+        while len(_response_cache) > RESPONSE_CACHE_SIZE:
+            _response_cache.popitem(last=False)
+
+
+def _lookup(url: str):
+    """Cached entry from memory, else from disk"""
+    with _response_cache_lock:
+        entry = _response_cache.get(url)
+        if entry is not None:
+            _response_cache.move_to_end(url)
+            return entry
+    disk_cache = _disk_cache
+    entry = disk_cache.get(url) if disk_cache is not None else None
+    if entry is not None:
+        _remember(url, entry)
+    return entry
+
+
+def get_json_page(url: str, timeout=DEFAULT_TIMEOUT) -> Tuple[Any, Mapping]:
+    """Get JSON from remote URL along with the response headers.
+    A cached response still within its Cache-Control max-age is returned
+    without a request. Otherwise, when it had an ETag, the request is made
+    conditional with If-None-Match, and a 304 Not Modified answer returns
+    the cached payload.
+    """
+    cached = _lookup(url)
+    if cached and cached.expires_at is not None and time.time() < cached.expires_at:
+        return cached.payload, CaseInsensitiveDict(cached.headers)
+
+    request_headers = {"If-None-Match": cached.etag} if cached and cached.etag else {}
+    response = get_session().get(url, headers=request_headers, timeout=timeout)
+    disk_cache = _disk_cache
+
+    if cached and response.status_code == 304:
+        headers = CaseInsensitiveDict(cached.headers)
+        headers.update(response.headers)
+        refreshed = cached._replace(headers=headers, expires_at=expires_at(headers))
+        _remember(url, refreshed)
+        if disk_cache is not None:
+            disk_cache.refresh(url, headers, refreshed.expires_at)
+        return cached.payload, headers
+
+    payload = response.json()
+    if response.status_code == 200 and is_storable(response.headers):
+        entry = CacheEntry(
+            response.headers.get("ETag"),
+            payload,
+            response.headers,
+            expires_at(response.headers),
+        )
+        _remember(url, entry)
+        if disk_cache is not None:
+            disk_cache.set(url, entry)
+    return payload, response.headers
+
+
+def get_json(url: str, timeout=DEFAULT_TIMEOUT) -> Dict:
     """Get JSON from remote URL."""
-    response = requests.get(url)
-    return response.json()
+    return get_json_page(url, timeout)[0]
+
+
+def stream_json_page(
+    url: str,
+    fields: Sequence[Sequence] = None,
+    chunk_size: int = STREAM_CHUNK_SIZE,
+    timeout=DEFAULT_TIMEOUT,
+) -> Tuple[Iterator, Mapping]:
+    """Stream the elements of a JSON array from remote URL.
+    Returns the elements as they are parsed, along with the response headers.
+    With `fields`, a list of key paths, each element is reduced to a tuple of
+    those values (None when missing) so the full objects are not kept.
+    The body is never held in full, so streamed responses skip the ETag cache.
+    """
+    response = get_session().get(url, stream=True, timeout=timeout)
 
+    def elements() -> Iterator:
+        # Closing the response hands the connection back to the pool
+        with response:
+            items = iter_json_array(response.iter_content(chunk_size))
+            if fields is not None:
+                items = iter_paths(items, fields, default=None)
+            yield from items
+
+    return elements(), response.headers
+
+
+def stream_json(
+    url: str,
+    fields: Sequence[Sequence] = None,
+    chunk_size: int = STREAM_CHUNK_SIZE,
+    timeout=DEFAULT_TIMEOUT,
+) -> Iterator:
+    """Stream the elements of a JSON array from remote URL."""
+    return stream_json_page(url, fields, chunk_size, timeout)[0]
+
+
+async def async_get_json_page(url: str, timeout=DEFAULT_TIMEOUT) -> Tuple[Any, Mapping]:
+    """get_json_page run in a worker thread, so the event loop is not blocked.
+    Calls still share the pooled session and the ETag cache.
+    """
+    return await asyncio.to_thread(get_json_page, url, timeout)
 
-def memoize(fn: Callable) -> Callable:
+
+async def async_get_json(url: str, timeout=DEFAULT_TIMEOUT) -> Dict:
+    """Get JSON from remote URL without blocking the event loop."""
+    return (await async_get_json_page(url, timeout))[0]
+
+
+def memoize(
+    fn: Callable = None,
+    *,
+    ttl: float = None,
+    shared: bool = False,
+    key: Callable = None,
+    maxsize: int = 128,
+) -> Callable:
     """Decorator to memoize a method.
+    Parameters
+    ----------
+    ttl: float
+        seconds before the cached value expires, never expires if None
+    shared: bool
+        share cached values between instances that have the same `key(self)`,
+        in a least recently used cache of `maxsize` entries
+    key: Callable
+        maps an instance to its cache key, required with `shared`
+    The value is computed once even when several threads ask for it at the
+    same time, and `del obj.a_method` drops the cached value.
     Example
     -------
     class MyClass:
@@ -63,17 +398,130 @@ def memoize(fn: Callable) -> Callable:
     42
     >>> my_object.a_method
     42
+    >>> del my_object.a_method
+    >>> my_object.a_method
+    a_method called
+    42
+    """
+    if fn is None:
+        return partial(memoize, ttl=ttl, shared=shared, key=key, maxsize=maxsize)
+
+    if shared and key is None:
+        raise ValueError("memoize(shared=True) needs a key function")
+
+    attr_name = "_{}".format(fn.__name__)
+    lock_name = "_{}_lock".format(fn.__name__)
+
+    # Cross-instance cache and its per-key locks, used when shared is set
+    shared_cache: OrderedDict = OrderedDict()
+    shared_locks: Dict = {}
+
+    def is_fresh(entry) -> bool:
+        return entry is not None and (entry[1] is None or time.monotonic() < entry[1])
+
+    def load(self):
+        if not shared:
+            return getattr(self, attr_name, None)
+        cache_key = key(self)
+        with _memoize_lock:
+            entry = shared_cache.get(cache_key)
+            if entry is not None:
+                shared_cache.move_to_end(cache_key)
+        return entry
+
+    def store(self, entry) -> None:
+        if not shared:
+            setattr(self, attr_name, entry)
+            return
+        cache_key = key(self)
+        with _memoize_lock:
+            shared_cache[cache_key] = entry
+            shared_cache.move_to_end(cache_key)
+            while len(shared_cache) > maxsize:
+                evicted_key, _ = shared_cache.popitem(last=False)
+                shared_locks.pop(evicted_key, None)
+
+    def get_lock(self):
+        with _memoize_lock:
+            if shared:
+                return shared_locks.setdefault(key(self), threading.RLock())
+            lock = getattr(self, lock_name, None)
+            if lock is None:
+                lock = threading.RLock()
+                setattr(self, lock_name, lock)
+            return lock
+
+    @wraps(fn)
+    def memoized(self):
+        """ "memoized wraps"""
+        entry = load(self)
+        if is_fresh(entry):
+            return entry[0]
+
+        with get_lock(self):
+            # Another thread may have filled the cache while we waited
+            entry = load(self)
+            if not is_fresh(entry):
+                expires_at = None if ttl is None else time.monotonic() + ttl
+                entry = (fn(self), expires_at)
+                store(self, entry)
+        return entry[0]
+
+    def invalidate(self) -> None:
+        """Drop the cached value"""
+        if shared:
+            with _memoize_lock:
+                shared_cache.pop(key(self), None)
+        elif hasattr(self, attr_name):
+            delattr(self, attr_name)
+
+    return property(memoized, None, invalidate)
+
+
+def async_memoize(fn: Callable = None, *, ttl: float = None) -> Callable:
+    """Decorator to memoize a coroutine method.
+    The property returns a task: `await obj.a_method` runs the coroutine on
+    first use, and callers awaiting at the same time share the same task.
+    A task that failed or was cancelled is not kept, so the next access
+    tries again, and `del obj.a_method` drops the cached value.
+    Example
+    -------
+    class MyClass:
+        @async_memoize
+        async def a_method(self):
+            return 42
+    >>> await my_object.a_method
+    42
     """
+    if fn is None:
+        return partial(async_memoize, ttl=ttl)
+
     attr_name = "_{}".format(fn.__name__)
 
+    def is_usable(entry) -> bool:
+        if entry is None:
+            return False
+        task, expires_at = entry
+        if expires_at is not None and time.monotonic() >= expires_at:
+            return False
+        return not task.done() or (not task.cancelled() and task.exception() is None)
+
     @wraps(fn)
     def memoized(self):
         """ "memoized wraps"""
-        if not hasattr(self, attr_name):
-            setattr(self, attr_name, fn(self))
-        return getattr(self, attr_name)
+        entry = getattr(self, attr_name, None)
+        if not is_usable(entry):
+            expires_at = None if ttl is None else time.monotonic() + ttl
+            entry = (asyncio.ensure_future(fn(self)), expires_at)
+            setattr(self, attr_name, entry)
+        return entry[0]
+
+    def invalidate(self) -> None:
+        """Drop the cached value"""
+        if hasattr(self, attr_name):
+            delattr(self, attr_name)
 
-    return property(memoized)
+    return property(memoized, None, invalidate)
 
 
 def valued_access_nested_map() -> None:
@@ -12,3 +12,8 @@ class ChatsConfig(AppConfig):
 
     default_auto_field = "django.db.models.BigAutoField"
     name = "chats"
+
+    def ready(self):
+        """Ready method to perform any startup tasks."""
+        # Import signals to ensure they are registered
+        import chats.signals  # noqa: F401
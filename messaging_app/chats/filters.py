@@ -1,7 +1,8 @@
+from django.core.exceptions import ValidationError
 from django_filters import rest_framework as filters
 from django_filters.filterset import FilterSet
 
-from .models import Conversation, Message, User
+from .models import Message, User
 
 
 class MessageFilter(FilterSet):
@@ -34,12 +35,9 @@ class MessageFilter(FilterSet):
         Returns messages from all conversations where the specified user is a participant.
         """
         try:
-            # Find all conversations where the user is a participant
-            conversations = Conversation.objects.filter(participants__user_id=value)
-
-            # Return all messages in those conversations
-            return queryset.filter(conversation__in=conversations).distinct()
-        except (ValueError, User.DoesNotExist):
+            # Messages in the conversations where the user is a participant
+            return queryset.with_participant(value)
+        except (ValueError, ValidationError, User.DoesNotExist):
             return queryset.none()
 
     class Meta:
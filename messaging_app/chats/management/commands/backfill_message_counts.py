@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from chats.models import Conversation
+
+
+class Command(BaseCommand):
+    help = "Recompute the message_count and last_message_at of conversations."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "conversation_ids",
+            nargs="*",
+            help="Only these conversations (default: all of them)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Conversations updated per UPDATE statement",
+        )
+
+    def handle(self, *args, **options):
+        conversations = Conversation.objects.order_by("pk")
+        if options["conversation_ids"]:
+            conversations = conversations.filter(pk__in=options["conversation_ids"])
+
+        # Batches keep each UPDATE, and the lock it holds, short
+        ids = list(conversations.values_list("pk", flat=True))
+        batch_size = options["batch_size"]
+        updated = 0
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start : start + batch_size]
+            updated += Conversation.objects.filter(pk__in=batch).recount_messages()
+
+        self.stdout.write(self.style.SUCCESS(f"Recounted {updated} conversations."))
@@ -0,0 +1,169 @@
+import random
+import time
+import uuid
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from chats.models import Conversation, Message, User
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a large number of messages, then show the query plans and latencies "
+        "of the message queries with and without the Message indexes. "
+        "Everything runs in a transaction that is rolled back, so only SQLite "
+        "and PostgreSQL, whose DDL is transactional, are supported."
+    )
+
+    # Backends that can roll back DROP INDEX along with the seeded rows
+    TRANSACTIONAL_DDL_VENDORS = ("sqlite", "postgresql")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=1_000_000)
+        parser.add_argument("--conversations", type=int, default=1_000)
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--batch-size", type=int, default=10_000)
+        parser.add_argument(
+            "--repeat", type=int, default=20, help="Runs of each query, the best is kept"
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor not in self.TRANSACTIONAL_DDL_VENDORS:
+            # e.g. MySQL commits DDL implicitly: the seeded rows would be kept
+            # and the indexes dropped for good
+            raise CommandError(
+                f"{connection.vendor} cannot roll back DROP INDEX; run this "
+                "command against SQLite or PostgreSQL."
+            )
+
+        with transaction.atomic():
+            started = time.perf_counter()
+            users, conversations = self.seed(options)
+            self.stdout.write(
+                f"Seeded {options['messages']} messages in "
+                f"{time.perf_counter() - started:.1f}s"
+            )
+
+            queries = self.queries(users, conversations)
+            after = self.measure(queries, options["repeat"])
+
+            # Drop the indexes, still inside the transaction. Plain SQL:
+            # SQLite's schema editor cannot be entered in a transaction
+            with connection.cursor() as cursor:
+                for index in Message._meta.indexes:
+                    cursor.execute(f"DROP INDEX {connection.ops.quote_name(index.name)}")
+                cursor.execute("ANALYZE")
+            before = self.measure(queries, options["repeat"])
+
+            for name in queries:
+                self.stdout.write(self.style.MIGRATE_HEADING(f"\n{name}"))
+                for label, results in (("without indexes", before), ("with indexes", after)):
+                    plan, latency = results[name]
+                    self.stdout.write(f"  {label}: {latency * 1000:.2f}ms")
+                    for line in plan.splitlines():
+                        self.stdout.write(f"    {line}")
+
+            transaction.set_rollback(True)
+        self.stdout.write(self.style.SUCCESS("\nRolled back the seeded data."))
+
+    def seed(self, options):
+        """Insert users, conversations and messages spread over a year."""
+        users = User.objects.bulk_create(
+            User(
+                email=f"bench{number}@example.com",
+                password="!",
+                first_name="Bench",
+                last_name=str(number),
+            )
+            for number in range(options["users"])
+        )
+        conversations = Conversation.objects.bulk_create(
+            Conversation() for _ in range(options["conversations"])
+        )
+        participants = [
+            (conversation, random.sample(users, 2)) for conversation in conversations
+        ]
+        Conversation.participants.through.objects.bulk_create(
+            Conversation.participants.through(conversation=conversation, user=user)
+            for conversation, pair in participants
+            for user in pair
+        )
+
+        # Raw inserts: bulk_create would overwrite sent_at (auto_now_add)
+        fields = [
+            Message._meta.get_field(name)
+            for name in (
+                "message_id",
+                "message_body",
+                "conversation",
+                "sender",
+                "receiver",
+                "sent_at",
+                "created_at",
+            )
+        ]
+        sql = "INSERT INTO {} ({}) VALUES ({})".format(
+            connection.ops.quote_name(Message._meta.db_table),
+            ", ".join(connection.ops.quote_name(field.column) for field in fields),
+            ", ".join(["%s"] * len(fields)),
+        )
+        id_field, body_field, conversation_field, sender_field, _, sent_at_field, _ = fields
+        body = body_field.get_db_prep_save("Benchmark message", connection)
+        # Database values of the (conversation, sender, receiver) choices
+        senders = [
+            (
+                conversation_field.get_db_prep_save(conversation.pk, connection),
+                sender_field.get_db_prep_save(pair[0].pk, connection),
+                sender_field.get_db_prep_save(pair[1].pk, connection),
+            )
+            for conversation, pair in participants
+        ]
+        now = timezone.now()
+        with connection.cursor() as cursor:
+            for start in range(0, options["messages"], options["batch_size"]):
+                rows = []
+                for _ in range(min(options["batch_size"], options["messages"] - start)):
+                    conversation, sender, receiver = random.choice(senders)
+                    sent_at = sent_at_field.get_db_prep_save(
+                        now - timedelta(seconds=random.randrange(365 * 86400)),
+                        connection,
+                    )
+                    message_id = id_field.get_db_prep_save(uuid.uuid4(), connection)
+                    rows.append(
+                        (message_id, body, conversation, sender, receiver, sent_at, sent_at)
+                    )
+                cursor.executemany(sql, rows)
+            cursor.execute("ANALYZE")
+        return users, conversations
+
+    def queries(self, users, conversations):
+        """The message queries of the API, with representative parameters."""
+        conversation = random.choice(conversations)
+        user = random.choice(users)
+        month_ago = timezone.now() - timedelta(days=30)
+        return {
+            "Conversation messages, first page": Message.objects.filter(
+                conversation=conversation
+            ).order_by("-sent_at", "-message_id")[:20],
+            "Messages sent by a user last month": Message.objects.filter(
+                sender=user, sent_at__gte=month_ago
+            ).order_by("-sent_at")[:20],
+            "Messages received by a user last month": Message.objects.filter(
+                receiver=user, sent_at__gte=month_ago
+            ).order_by("-sent_at")[:20],
+        }
+
+    def measure(self, queries, repeat):
+        """Query plan and best latency of every query."""
+        results = {}
+        for name, queryset in queries.items():
+            latencies = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(queryset.all())
+                latencies.append(time.perf_counter() - started)
+            results[name] = (queryset.explain(), min(latencies))
+        return results
@@ -0,0 +1,68 @@
+"""membership.py
+Resolves which conversations the user of a request takes part in.
+The conversation IDs are loaded once per request and shared by the
+permission classes and views. Set CHATS_MEMBERSHIP_CACHE_TTL (seconds)
+to also keep them in the Django cache across requests; the cached IDs
+are dropped whenever the participants of a conversation change.
+"""
+
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Conversation
+
+REQUEST_ATTRIBUTE = "_chats_conversation_ids"
+
+
+def cache_key(user_id) -> str:
+    """Cache key of a user's conversation IDs."""
+    return f"chats:membership:{user_id}"
+
+
+def load_conversation_ids(user) -> frozenset:
+    """IDs of the conversations a user takes part in, from the cache or the database."""
+    ttl = getattr(settings, "CHATS_MEMBERSHIP_CACHE_TTL", 0)
+    if ttl:
+        conversation_ids = cache.get(cache_key(user.pk))
+        if conversation_ids is not None:
+            return conversation_ids
+
+    conversation_ids = frozenset(
+        Conversation.participants.through.objects.filter(user=user).values_list(
+            "conversation_id", flat=True
+        )
+    )
+    if ttl:
+        cache.set(cache_key(user.pk), conversation_ids, ttl)
+    return conversation_ids
+
+
+def conversation_ids(request) -> frozenset:
+    """IDs of the conversations the request's user takes part in, loaded once per request."""
+    if not (request.user and request.user.is_authenticated):
+        return frozenset()
+
+    # DRF's Request wraps the HttpRequest, store on the latter so it is shared
+    http_request = getattr(request, "_request", request)
+    ids = getattr(http_request, REQUEST_ATTRIBUTE, None)
+    if ids is None:
+        ids = load_conversation_ids(request.user)
+        setattr(http_request, REQUEST_ATTRIBUTE, ids)
+    return ids
+
+
+def is_participant(request, conversation_id) -> bool:
+    """Whether the request's user takes part in a conversation."""
+    try:
+        conversation_id = uuid.UUID(str(conversation_id))
+    except ValueError:
+        return False
+    return conversation_id in conversation_ids(request)
+
+
+def invalidate(user_ids) -> None:
+    """Forget the cached conversation IDs of these users."""
+    if getattr(settings, "CHATS_MEMBERSHIP_CACHE_TTL", 0):
+        cache.delete_many([cache_key(user_id) for user_id in user_ids])
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.2 on 2026-10-19 10:46
+
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_messages(apps, schema_editor):
+    """Fill the new counters from the existing messages."""
+    Conversation = apps.get_model("chats", "Conversation")
+    Message = apps.get_model("chats", "Message")
+    messages = Message.objects.filter(conversation=OuterRef("pk")).order_by().values("conversation")
+    Conversation.objects.update(
+        message_count=Coalesce(Subquery(messages.annotate(count=Count("*")).values("count")), 0),
+        last_message_at=Subquery(messages.annotate(latest=Max("sent_at")).values("latest")),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0002_alter_conversation_conversation_id_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Timestamp of the latest message in the conversation', null=True),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='message_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Number of messages in the conversation'),
+        ),
+        migrations.RunPython(count_messages, migrations.RunPython.noop),
+    ]
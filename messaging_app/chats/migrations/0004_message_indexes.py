@@ -0,0 +1,25 @@
+# Generated by Django 5.2.2 on 2026-10-19 10:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0003_conversation_message_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['conversation', 'sent_at', 'message_id'], name='message_conversation_sent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['sender', 'sent_at'], name='message_sender_sent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['receiver', 'sent_at'], name='message_receiver_sent_idx'),
+        ),
+    ]
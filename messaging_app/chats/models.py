@@ -5,7 +5,9 @@ including the structure of the database tables.
 """
 
 import uuid
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, Count, Exists, F, Max, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager
 
 
@@ -97,12 +99,118 @@ class User(AbstractBaseUser):
         return f"{self.first_name} {self.last_name} <{self.email}>"
 
 
+def count_subquery(queryset: models.QuerySet, field: str) -> Coalesce:
+    """
+    Count the rows of queryset grouped by field, as a subquery.
+    Unlike annotate(Count(...)) over joins, several of these can be combined
+    without multiplying each other's rows.
+    """
+    counts = (
+        queryset.order_by().values(field).annotate(count=Count("*")).values("count")
+    )
+    return Coalesce(Subquery(counts), 0)
+
+
+def latest_message_subquery() -> Subquery:
+    """sent_at of the latest message of each conversation, as a subquery."""
+    return Subquery(
+        Message.objects.filter(conversation=OuterRef("pk"))
+        .order_by()
+        .values("conversation")
+        .annotate(latest=Max("sent_at"))
+        .values("latest")
+    )
+
+
+class ConversationQuerySet(models.QuerySet):
+    """QuerySet for conversations."""
+
+    def with_counts(self):
+        """
+        Annotate participant_count, so serializing a page of conversations
+        does not count per row. message_count is a column of its own.
+        """
+        return self.annotate(
+            participant_count=count_subquery(
+                Conversation.participants.through.objects.filter(
+                    conversation=OuterRef("pk")
+                ),
+                "conversation",
+            ),
+        )
+
+    def count_new_messages(self, count: int, last_sent_at) -> int:
+        """
+        Add count messages, the latest sent at last_sent_at, to the counters.
+        A single UPDATE, so concurrent messages cannot lose an increment.
+        """
+        return self.update(
+            message_count=F("message_count") + count,
+            last_message_at=Case(
+                When(last_message_at__gte=last_sent_at, then=F("last_message_at")),
+                default=Value(last_sent_at),
+            ),
+        )
+
+    def recount_messages(self) -> int:
+        """
+        Recompute message_count and last_message_at from the messages,
+        in one UPDATE. For rows written without signals, e.g. bulk_create.
+        """
+        return self.update(
+            message_count=count_subquery(
+                Message.objects.filter(conversation=OuterRef("pk")), "conversation"
+            ),
+            last_message_at=latest_message_subquery(),
+        )
+
+
+class MessageQuerySet(models.QuerySet):
+    """QuerySet for messages."""
+
+    def with_participant(self, user):
+        """
+        Messages of the conversations that user (a User or a user_id) takes part in.
+        An EXISTS on the participants table: unlike a join through
+        conversations it cannot repeat a message, so no DISTINCT is needed.
+        """
+        return self.filter(
+            Exists(
+                Conversation.participants.through.objects.filter(
+                    conversation=OuterRef("conversation"), user=user
+                )
+            )
+        )
+
+    def with_message_count(self):
+        """Annotate message_count, the number of messages in each message's conversation."""
+        return self.annotate(message_count=F("conversation__message_count"))
+
+    def delete(self):
+        """
+        Delete the messages, then recount their conversations once.
+        Counting here rather than in a post_delete receiver keeps cascades
+        from conversations and users fast: Django bulk-deletes related rows
+        only when no delete signal is connected to their model.
+        """
+        conversation_ids = list(
+            self.order_by().values_list("conversation_id", flat=True).distinct()
+        )
+        with transaction.atomic(using=self.db):
+            deleted = super().delete()
+            Conversation.objects.filter(pk__in=conversation_ids).recount_messages()
+        return deleted
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
 class Conversation(models.Model):
     """
     Model representing a conversation between users.
     """
 
-    objects = models.Manager()
+    objects = ConversationQuerySet.as_manager()
 
     conversation_id = models.UUIDField(
         primary_key=True,
@@ -117,13 +225,28 @@ class Conversation(models.Model):
         help_text="Users participating in the conversation",
     )
 
+    # Kept up to date by the signals in chats/signals.py and by deleting
+    # messages through Message.delete() or MessageQuerySet.delete()
+    message_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Number of messages in the conversation",
+    )
+
+    last_message_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Timestamp of the latest message in the conversation",
+    )
+
 
 class Message(models.Model):
     """
     Model representing a message in a conversation.
     """
 
-    objects = models.Manager()
+    objects = MessageQuerySet.as_manager()
 
     message_id = models.UUIDField(
         primary_key=True,
@@ -167,3 +290,26 @@ class Message(models.Model):
         auto_now_add=True,
         help_text="Timestamp when the message was created",
     )
+
+    def delete(self, using=None, keep_parents=False):
+        """Delete the message and recount its conversation."""
+        with transaction.atomic(using=using or self._state.db):
+            deleted = super().delete(using=using, keep_parents=keep_parents)
+            Conversation.objects.filter(pk=self.conversation_id).recount_messages()
+        return deleted
+
+    class Meta:
+        """Meta class for Message."""
+
+        indexes = [
+            # A conversation's messages in the (sent_at, message_id) order of the cursor pagination
+            models.Index(
+                fields=["conversation", "sent_at", "message_id"],
+                name="message_conversation_sent_idx",
+            ),
+            # MessageFilter's sender/receiver filters, usually with a sent_at range
+            models.Index(fields=["sender", "sent_at"], name="message_sender_sent_idx"),
+            models.Index(
+                fields=["receiver", "sent_at"], name="message_receiver_sent_idx"
+            ),
+        ]
@@ -1,13 +1,22 @@
 '''pagination.py
-This module defines a custom pagination class
-for handling message sets in the messaging application.
-It extends the `PageNumberPagination` class
-from Django REST Framework to provide pagination
-functionality for messages.
+This module defines custom pagination classes
+for handling message sets in the messaging application:
+a page-number one extending `PageNumberPagination`
+from Django REST Framework, and a cursor (keyset) one
+for scrolling through long message histories.
 """'''
 
-from rest_framework.pagination import PageNumberPagination
+import base64
+import binascii
+import json
+import uuid
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class MessageSetPagination(PageNumberPagination):
@@ -30,3 +39,114 @@ class MessageSetPagination(PageNumberPagination):
                 "results": data,
             }
         )
+
+
+class MessageCursorPagination(BasePagination):
+    """
+    Keyset pagination for messages, newest first.
+    Pages are found by their position in the ordering (sent_at, message_id)
+    rather than by an offset, so every page costs the same however deep
+    the history, and no COUNT(*) is needed. The cursor in the next and
+    previous links is opaque to clients. Pass include_total=1 to get an
+    approximate_count, which the view computes from the conversation counters.
+    """
+
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    include_total_query_param = "include_total"
+    ordering = ("-sent_at", "-message_id")
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.view = view
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+
+        # Newest first; a previous page is read oldest first then reversed
+        if cursor is None:
+            reverse = False
+            queryset = queryset.order_by(*self.ordering)
+        else:
+            sent_at, message_id, reverse = cursor
+            if reverse:
+                queryset = queryset.order_by("sent_at", "message_id").filter(
+                    Q(sent_at__gt=sent_at)
+                    | Q(sent_at=sent_at, message_id__gt=message_id)
+                )
+            else:
+                queryset = queryset.order_by(*self.ordering).filter(
+                    Q(sent_at__lt=sent_at)
+                    | Q(sent_at=sent_at, message_id__lt=message_id)
+                )
+
+        # One extra row tells whether there is a page after this one
+        results = list(queryset[: page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def encode_cursor(self, message, reverse: bool) -> str:
+        """Opaque cursor pointing at a message's position."""
+        position = {
+            "s": message.sent_at.isoformat(),
+            "m": message.message_id.hex,
+            "r": int(reverse),
+        }
+        token = base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        """(sent_at, message_id, reverse) of the cursor, or None on the first page."""
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(token.encode()))
+            return (
+                datetime.fromisoformat(position["s"]),
+                uuid.UUID(position["m"]),
+                bool(position["r"]),
+            )
+        # AttributeError: uuid.UUID() given a number instead of a string
+        except (AttributeError, TypeError, ValueError, KeyError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        response = {
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        }
+        include_total = self.request.query_params.get(self.include_total_query_param)
+        get_approximate_count = getattr(self.view, "get_approximate_count", None)
+        if include_total in ("1", "true") and get_approximate_count is not None:
+            response["approximate_count"] = get_approximate_count()
+        return Response(response)
@@ -2,7 +2,7 @@
 
 from rest_framework import permissions
 
-from .models import Conversation
+from .membership import is_participant
 
 
 class IsActiveUser(permissions.BasePermission):
@@ -39,13 +39,8 @@ class IsConversationParticipant(permissions.BasePermission):
             return False
 
         # Check if the user is a participant in the conversation
-        try:
-            conversation = Conversation.objects.get(conversation_id=conversation_pk)
-            return conversation.participants.filter(
-                user_id=request.user.user_id
-            ).exists()
-        except Conversation.DoesNotExist:
-            return False
+        # (False as well when the conversation does not exist)
+        return is_participant(request, conversation_pk)
 
     def has_object_permission(self, request, view, obj):
         """
@@ -55,12 +50,7 @@ class IsConversationParticipant(permissions.BasePermission):
         For update and delete operations, we also check if the user is the sender of the message.
         """
         # First check if the user is a participant in the conversation
-        conversation = obj.conversation
-        user_is_participant = conversation.participants.filter(
-            user_id=request.user.user_id
-        ).exists()
-
-        if not user_is_participant:
+        if not is_participant(request, obj.conversation_id):
             return False
 
         # For GET requests, being a participant is enough
@@ -68,7 +58,7 @@ class IsConversationParticipant(permissions.BasePermission):
             return True
 
         # For PUT, PATCH, DELETE, the user must be the sender of the message
-        return obj.sender.user_id == request.user.user_id
+        return obj.sender_id == request.user.user_id
 
 
 class CanAccessMessages(permissions.BasePermission):
@@ -93,12 +83,7 @@ class CanAccessMessages(permissions.BasePermission):
         For modifications, user must be the sender of the message.
         """
         # Check if user is a participant in the conversation
-        conversation = obj.conversation
-        user_is_participant = conversation.participants.filter(
-            user_id=request.user.user_id
-        ).exists()
-
-        if not user_is_participant:
+        if not is_participant(request, obj.conversation_id):
             return False
 
         # For GET requests, being a participant is enough
@@ -106,4 +91,4 @@ class CanAccessMessages(permissions.BasePermission):
             return True
 
         # For PUT, PATCH, DELETE, the user must be the sender of the message
-        return obj.sender.user_id == request.user.user_id
+        return obj.sender_id == request.user.user_id
@@ -4,6 +4,10 @@
 # such as Django models, into JSON or other content types that can be easily rendered into a response.
 """
 
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
 from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
@@ -21,9 +25,100 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ("user_id",)
 
 
+class PrefetchedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Primary key related field that first looks the object up in the
+    instances prefetched in context["prefetched"] ({model: {pk: instance}}),
+    so a list of items does not run one query per item.
+    """
+
+    def to_internal_value(self, data):
+        model = self.get_queryset().model
+        instances = self.context.get("prefetched", {}).get(model)
+        if instances:
+            try:
+                instance = instances.get(model._meta.pk.to_python(data))
+            except (TypeError, ValueError, DjangoValidationError):
+                instance = None
+            if instance is not None:
+                return instance
+        return super().to_internal_value(data)
+
+
+class BulkMessageSerializer(serializers.ListSerializer):
+    """
+    List serializer for creating many messages with MessageSerializer's rules.
+    The senders, receivers and conversations of all the items are fetched
+    in one query each, and the messages inserted with bulk_create.
+    """
+
+    MAX_MESSAGES = 500
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self._context = {**self.context, "prefetched": self.prefetch(data)}
+        return super().to_internal_value(data)
+
+    @staticmethod
+    def valid_pks(model, values) -> list:
+        """The values that are valid primary keys of model, converted."""
+        pks = []
+        for value in values:
+            try:
+                pk = model._meta.pk.to_python(value)
+            except (TypeError, ValueError, DjangoValidationError):
+                continue
+            if pk is not None:
+                pks.append(pk)
+        return pks
+
+    def prefetch(self, data) -> dict:
+        """Users and conversations referenced by the items, keyed by primary key."""
+        items = [item for item in data if isinstance(item, dict)]
+
+        def ids(*names):
+            # Anything else is left to the fields to reject
+            return {
+                item[name]
+                for item in items
+                for name in names
+                if isinstance(item.get(name), (str, int))
+            }
+
+        user_ids = ids("sender", "receiver")
+        conversation_ids = ids("conversation")
+        return {
+            User: User.objects.in_bulk(self.valid_pks(User, user_ids)),
+            Conversation: Conversation.objects.in_bulk(
+                self.valid_pks(Conversation, conversation_ids)
+            ),
+        }
+
+    def create(self, validated_data):
+        messages = [Message(**item) for item in validated_data]
+        sent_at = defaultdict(list)
+        with transaction.atomic():
+            messages = Message.objects.bulk_create(messages)
+            # bulk_create sends no post_save, so count the messages here
+            for message in messages:
+                sent_at[message.conversation_id].append(message.sent_at)
+            for conversation_id, times in sent_at.items():
+                Conversation.objects.filter(pk=conversation_id).count_new_messages(
+                    len(times), max(times)
+                )
+
+        # The prefetched conversations predate the new counts
+        conversations = Conversation.objects.in_bulk(list(sent_at))
+        for message in messages:
+            message.conversation = conversations[message.conversation_id]
+        return messages
+
+
 class MessageSerializer(serializers.ModelSerializer):
     """Serializer for the Message model."""
 
+    serializer_related_field = PrefetchedPrimaryKeyRelatedField
+
     content = serializers.CharField(
         source="message_body",
         help_text="Content of the message",
@@ -58,10 +153,18 @@ class MessageSerializer(serializers.ModelSerializer):
             "sender": {"required": True},
             "receiver": {"required": True},
         }
+        list_serializer_class = BulkMessageSerializer
 
     def get_message_count(self, obj) -> int:
-        """Get the count of messages in the conversation."""
-        return obj.conversation.messages.count()
+        """
+        Get the count of messages in the conversation.
+        Uses the count annotated on the message when there is one,
+        else the counter kept on the conversation.
+        """
+        message_count = getattr(obj, "message_count", None)
+        if message_count is None:
+            message_count = obj.conversation.message_count
+        return message_count
 
     def validate(self, attrs):
         """Validate the message content and check sender/receiver."""
@@ -86,13 +189,15 @@ class MessageSerializer(serializers.ModelSerializer):
                 "Sender and receiver cannot be the same user."
             )
 
-        # Check if sender and receiver exist
-        if not User.objects.filter(user_id=getattr(sender, "user_id", sender)).exists():
+        # Check if sender and receiver exist; users resolved by the
+        # related fields were just loaded, only raw IDs need a query
+        if not isinstance(sender, User) and not User.objects.filter(user_id=sender).exists():
             raise serializers.ValidationError("Sender user does not exist.")
 
-        if not User.objects.filter(
-            user_id=getattr(receiver, "user_id", receiver)
-        ).exists():
+        if (
+            not isinstance(receiver, User)
+            and not User.objects.filter(user_id=receiver).exists()
+        ):
             raise serializers.ValidationError("Receiver user does not exist.")
 
         return attrs
@@ -129,21 +234,22 @@ class ConversationSerializer(serializers.ModelSerializer):
 
     def get_participant_count(self, obj) -> int:
         """Get the count of participants in the conversation."""
-        return obj.participants.count()
+        participant_count = getattr(obj, "participant_count", None)
+        if participant_count is None:
+            # Counts the prefetched participants without a query when there are some
+            participant_count = len(obj.participants.all())
+        return participant_count
 
     def create(self, validated_data):
         """Create a new conversation with participants."""
         participant_ids = validated_data.pop("participant_ids", [])
         conversation = Conversation.objects.create(**validated_data)
 
-        # Add participants to the conversation
+        # Add participants to the conversation, skipping unknown user IDs
         if participant_ids:
-            for user_id in participant_ids:
-                try:
-                    user = User.objects.get(user_id=user_id)
-                    conversation.participants.add(user)
-                except User.DoesNotExist:
-                    pass
+            conversation.participants.add(
+                *User.objects.filter(user_id__in=participant_ids)
+            )
 
         return conversation
 
@@ -0,0 +1,73 @@
+"""signals.py
+Module for Django signals in the chats application.
+Keeps the message counters of conversations up to date.
+"""
+
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import membership
+from .models import Conversation, Message, User
+
+
+@receiver(post_save, sender=Message)
+def count_created_message(sender, instance, created, **kwargs):
+    """Signal to count a new message on its conversation."""
+
+    if not created:
+        return
+
+    Conversation.objects.filter(pk=instance.conversation_id).count_new_messages(
+        1, instance.sent_at
+    )
+
+
+# Deleted messages are uncounted by Message.delete() and MessageQuerySet.delete():
+# a post_delete receiver on Message would stop Django from bulk-deleting the
+# messages of a deleted conversation or user, one query per message instead.
+
+
+@receiver(pre_delete, sender=User)
+def collect_user_conversations(sender, instance, **kwargs):
+    """Signal to note the conversations a deleted user's messages belong to."""
+
+    instance._message_conversation_ids = list(
+        Message.objects.filter(Q(sender=instance) | Q(receiver=instance))
+        .order_by()
+        .values_list("conversation_id", flat=True)
+        .distinct()
+    )
+
+
+@receiver(post_delete, sender=User)
+def recount_user_conversations(sender, instance, **kwargs):
+    """Signal to recount the conversations that lost a deleted user's messages."""
+
+    conversation_ids = getattr(instance, "_message_conversation_ids", None)
+    if conversation_ids:
+        Conversation.objects.filter(pk__in=conversation_ids).recount_messages()
+
+
+@receiver(m2m_changed, sender=Conversation.participants.through)
+def forget_memberships(sender, instance, action, reverse, pk_set, **kwargs):
+    """Signal to drop the cached conversation IDs of users who joined or left."""
+
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+
+    if reverse:
+        # instance is a User whose conversations changed
+        membership.invalidate([instance.pk])
+    elif action == "pre_clear":
+        # Nobody is left to tell after the clear, so collect them before
+        membership.invalidate(instance.participants.values_list("pk", flat=True))
+    else:
+        membership.invalidate(pk_set)
+
+
+@receiver(pre_delete, sender=Conversation)
+def forget_deleted_conversation(sender, instance, **kwargs):
+    """Signal to drop the cached conversation IDs of a deleted conversation's users."""
+
+    membership.invalidate(instance.participants.values_list("pk", flat=True))
@@ -0,0 +1,153 @@
+"""tests.py
+Tests for the chats models, signals and management commands.
+"""
+
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from .models import Conversation, Message, User
+
+
+class MessageCounterTests(TestCase):
+    """
+    Conversation.message_count and last_message_at follow the messages.
+    """
+
+    def setUp(self):
+        self.sender = User.objects.create_user(
+            email="alice@example.com", password="password", first_name="Alice"
+        )
+        self.receiver = User.objects.create_user(
+            email="bob@example.com", password="password", first_name="Bob"
+        )
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.sender, self.receiver)
+
+    def send(self, body: str = "Hello") -> Message:
+        """Create a message in the conversation."""
+        return Message.objects.create(
+            message_body=body,
+            conversation=self.conversation,
+            sender=self.sender,
+            receiver=self.receiver,
+        )
+
+    def test_create_and_delete(self):
+        """Creating and deleting messages updates the counters."""
+        first = self.send()
+        second = self.send()
+
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.message_count, 2)
+        self.assertEqual(self.conversation.last_message_at, second.sent_at)
+
+        second.delete()
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.message_count, 1)
+        self.assertEqual(self.conversation.last_message_at, first.sent_at)
+
+        first.delete()
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.message_count, 0)
+        self.assertIsNone(self.conversation.last_message_at)
+
+    def test_older_message(self):
+        """A message older than the latest one does not move last_message_at back."""
+        self.send()
+        later = self.send().sent_at + timedelta(hours=1)
+        Conversation.objects.filter(pk=self.conversation.pk).update(
+            last_message_at=later
+        )
+
+        self.send()
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.message_count, 3)
+        self.assertEqual(self.conversation.last_message_at, later)
+
+    def test_queryset_delete(self):
+        """Deleting a queryset of messages recounts each conversation once."""
+        first = self.send()
+        for _ in range(3):
+            self.send()
+
+        with CaptureQueriesContext(connection) as queries:
+            Message.objects.exclude(pk=first.pk).delete()
+
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.message_count, 1)
+        self.assertEqual(self.conversation.last_message_at, first.sent_at)
+        # Conversation IDs, DELETE, recount, plus the savepoint
+        self.assertLessEqual(len(queries), 5)
+
+    def test_delete_conversation(self):
+        """Deleting a conversation bulk-deletes its messages."""
+        for _ in range(3):
+            self.send()
+        with CaptureQueriesContext(connection) as few:
+            self.conversation.delete()
+
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.sender, self.receiver)
+        for _ in range(300):
+            self.send()
+        with CaptureQueriesContext(connection) as many:
+            self.conversation.delete()
+
+        self.assertEqual(len(few), len(many))
+        self.assertFalse(Message.objects.exists())
+
+    def test_delete_user(self):
+        """Deleting a user recounts the conversations that lost messages."""
+        self.send()
+        other = Conversation.objects.create()
+        Message.objects.create(
+            message_body="Hi",
+            conversation=other,
+            sender=self.receiver,
+            receiver=self.sender,
+        )
+        third = User.objects.create_user(
+            email="carol@example.com", password="password", first_name="Carol"
+        )
+        kept = Message.objects.create(
+            message_body="Hi",
+            conversation=other,
+            sender=third,
+            receiver=self.receiver,
+        )
+
+        self.sender.delete()
+
+        self.conversation.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.conversation.message_count, 0)
+        self.assertIsNone(self.conversation.last_message_at)
+        self.assertEqual(other.message_count, 1)
+        self.assertEqual(other.last_message_at, kept.sent_at)
+
+    def test_backfill_command(self):
+        """The backfill command repairs counters written without signals."""
+        self.send()
+        Message.objects.bulk_create(
+            Message(
+                message_body="Imported",
+                conversation=self.conversation,
+                sender=self.sender,
+                receiver=self.receiver,
+            )
+            for _ in range(4)
+        )
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.message_count, 1)
+
+        out = StringIO()
+        call_command("backfill_message_counts", stdout=out)
+
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.message_count, 5)
+        self.assertIn("Recounted 1 conversations.", out.getvalue())
@@ -0,0 +1,404 @@
+"""tests_api.py
+Tests for the chats API endpoints.
+"""
+
+import base64
+import json
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from .models import Conversation, Message, User
+
+
+class ChatsAPITestCase(TestCase):
+    """
+    Two users, the first one authenticated, and helpers to add data.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="alice@example.com",
+            password="password",
+            first_name="Alice",
+            last_name="Smith",
+        )
+        self.other = User.objects.create_user(
+            email="bob@example.com",
+            password="password",
+            first_name="Bob",
+            last_name="Jones",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add_messages(self, conversation: Conversation, messages: int):
+        """Add messages from the user to the other user."""
+        Message.objects.bulk_create(
+            Message(
+                message_body=f"Message {number}",
+                conversation=conversation,
+                sender=self.user,
+                receiver=self.other,
+            )
+            for number in range(messages)
+        )
+        # bulk_create does not send the signals that keep the counters
+        Conversation.objects.filter(pk=conversation.pk).recount_messages()
+
+    def add_conversations(self, conversations: int, messages: int):
+        """Create conversations between the two users, with messages in each."""
+        for _ in range(conversations):
+            conversation = Conversation.objects.create()
+            conversation.participants.add(self.user, self.other)
+            self.add_messages(conversation, messages)
+        return conversation
+
+    def count_queries(self, url: str):
+        """Return the response to a GET request and the queries it ran."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+
+class QueryBudgetTests(ChatsAPITestCase):
+    """
+    The number of queries per request must not grow with the data returned.
+    """
+
+    # Count of conversations, page of conversations with their annotated
+    # counts, prefetched participants, prefetched messages
+    CONVERSATION_LIST_QUERIES = 4
+    # The same without the count of the pagination
+    CONVERSATION_DETAIL_QUERIES = 3
+
+    def test_conversation_list(self):
+        """Listing conversations runs the same queries for 1 or 20 conversations."""
+        url = reverse("conversation-list")
+        self.add_conversations(1, 3)
+        _, few = self.count_queries(url)
+
+        last = self.add_conversations(19, 30)
+        response, many = self.count_queries(url)
+
+        self.assertEqual(few, many)
+        self.assertEqual(many, self.CONVERSATION_LIST_QUERIES)
+
+        conversation = next(
+            result
+            for result in response.data["results"]
+            if result["conversation_id"] == str(last.pk)
+        )
+        self.assertEqual(conversation["participant_count"], 2)
+        self.assertEqual(len(conversation["messages"]), 30)
+        self.assertEqual(conversation["messages"][0]["message_count"], 30)
+
+    def test_conversation_detail(self):
+        """Retrieving a conversation does not count its messages one by one."""
+        conversation = self.add_conversations(1, 50)
+        url = reverse("conversation-detail", args=[conversation.pk])
+
+        response, queries = self.count_queries(url)
+
+        self.assertEqual(queries, self.CONVERSATION_DETAIL_QUERIES)
+        self.assertEqual(response.data["participant_count"], 2)
+        self.assertEqual(response.data["messages"][0]["message_count"], 50)
+
+    def test_message_list(self):
+        """Listing messages annotates the conversation's message count."""
+        conversation = self.add_conversations(1, 2)
+        url = reverse(
+            "conversation-messages-list", kwargs={"conversation_pk": conversation.pk}
+        )
+        _, few = self.count_queries(url)
+
+        self.add_messages(conversation, 23)
+        response, many = self.count_queries(url)
+
+        self.assertEqual(few, many)
+        self.assertEqual(response.data["results"][0]["message_count"], 25)
+
+
+class ConversationOrderTests(ChatsAPITestCase):
+    """
+    Conversations are listed in a stable order.
+    """
+
+    def test_conversation_order(self):
+        """Conversations are listed by latest message, then ID."""
+        empty = Conversation.objects.create()
+        empty.participants.add(self.user)
+        older = self.add_conversations(1, 1)
+        newer = self.add_conversations(1, 1)
+        latest = Message.objects.latest("sent_at").sent_at
+        Conversation.objects.filter(pk=older.pk).update(last_message_at=latest)
+        Conversation.objects.filter(pk=newer.pk).update(
+            last_message_at=latest + timedelta(hours=1)
+        )
+
+        response = self.client.get(reverse("conversation-list"))
+
+        self.assertEqual(
+            [result["conversation_id"] for result in response.data["results"]],
+            [str(newer.pk), str(older.pk), str(empty.pk)],
+        )
+
+
+class MessageCreateTests(ChatsAPITestCase):
+    """
+    Creating a message through the nested messages endpoint.
+    """
+
+    def test_create_message_count(self):
+        """Creating a message returns the count including the new message."""
+        conversation = self.add_conversations(1, 2)
+        url = reverse(
+            "conversation-messages-list", kwargs={"conversation_pk": conversation.pk}
+        )
+
+        for expected in (3, 4):
+            response = self.client.post(
+                url, {"content": "Hello", "receiver": str(self.other.pk)}, format="json"
+            )
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(response.data["message_count"], expected)
+
+
+class MessageCursorPaginationTests(ChatsAPITestCase):
+    """
+    Paging through messages with the opaque (sent_at, message_id) cursor.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.conversation = self.add_conversations(1, 45)
+        # Ties on sent_at are broken by message_id
+        first = Message.objects.order_by("sent_at").first()
+        Message.objects.filter(
+            pk__in=Message.objects.order_by("sent_at").values("pk")[:10]
+        ).update(sent_at=first.sent_at)
+        self.url = reverse(
+            "conversation-messages-list",
+            kwargs={"conversation_pk": self.conversation.pk},
+        )
+        self.expected = [
+            str(message_id)
+            for message_id in Message.objects.order_by(
+                "-sent_at", "-message_id"
+            ).values_list("message_id", flat=True)
+        ]
+
+    def walk(self, url: str, link: str):
+        """Follow the link until the end, returning the pages of message IDs."""
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([result["message_id"] for result in response.data["results"]])
+            url = response.data[link]
+        return pages, response
+
+    def test_forward_and_back(self):
+        """Next links visit every message once; previous links come back."""
+        pages, last = self.walk(self.url, "next")
+
+        self.assertEqual([len(page) for page in pages], [20, 20, 5])
+        self.assertEqual(sum(pages, []), self.expected)
+
+        back, first = self.walk(last.data["previous"], "previous")
+        self.assertEqual(back, pages[-2::-1])
+        self.assertIsNone(first.data["previous"])
+        self.assertNotIn("count", first.data)
+
+    def test_constant_queries(self):
+        """A deep page runs the same queries as the first one."""
+        first, first_queries = self.count_queries(self.url + "?page_size=5")
+        url = first.data["next"]
+        for _ in range(6):
+            url = self.client.get(url).data["next"]
+        _, deep_queries = self.count_queries(url)
+
+        self.assertEqual(first_queries, deep_queries)
+
+    def test_approximate_count(self):
+        """include_total reads the conversation counter."""
+        response = self.client.get(self.url + "?include_total=1")
+
+        self.assertEqual(response.data["approximate_count"], 45)
+
+    def test_invalid_cursor(self):
+        """A cursor that does not decode is a 404."""
+        positions = [
+            {"s": "2024-01-01T00:00:00+00:00", "m": 5, "r": 0},
+            {"s": 5, "m": str(self.expected[0]), "r": 0},
+            ["not", "a", "position"],
+        ]
+        cursors = ["not-a-cursor"] + [
+            base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+            for position in positions
+        ]
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                response = self.client.get(self.url, {"cursor": cursor})
+                self.assertEqual(response.status_code, 404)
+
+
+class MessageQueryTests(ChatsAPITestCase):
+    """
+    The global messages endpoint runs one plain query for its page.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.add_conversations(3, 10)
+        # A conversation the user is not part of
+        outsider = User.objects.create_user(
+            email="eve@example.com", password="password", first_name="Eve"
+        )
+        conversation = Conversation.objects.create()
+        conversation.participants.add(self.other, outsider)
+        self.add_messages(conversation, 5)
+
+    def test_no_distinct(self):
+        """Listing messages runs a single query, without DISTINCT."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("message-list") + "?page_size=50")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), 30)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn("DISTINCT", queries[0]["sql"])
+
+    def test_query_plan(self):
+        """The plan checks membership per message instead of deduplicating rows."""
+        queryset = Message.objects.with_participant(self.user).with_message_count()
+
+        plan = queryset.explain()
+
+        self.assertEqual(queryset.count(), 30)
+        self.assertNotIn("DISTINCT", plan)
+        if connection.vendor == "sqlite":
+            self.assertIn("chats_conversation_participants", plan)
+
+    def test_participant_filter(self):
+        """The participant filter uses the same EXISTS."""
+        response = self.client.get(
+            reverse("message-list"), {"participant": str(self.other.pk), "page_size": 50}
+        )
+
+        self.assertEqual(len(response.data["results"]), 30)
+
+
+class MembershipTests(ChatsAPITestCase):
+    """
+    Permissions resolve conversation membership once per request.
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.conversation = self.add_conversations(1, 1)
+        self.message = Message.objects.get()
+        self.url = reverse(
+            "conversation-messages-detail",
+            kwargs={"conversation_pk": self.conversation.pk, "pk": self.message.pk},
+        )
+
+    def test_one_membership_query(self):
+        """has_permission and has_object_permission share one membership query."""
+        response, queries = self.count_queries(self.url)
+
+        self.assertEqual(response.data["message_id"], str(self.message.pk))
+        # The user's conversation IDs, then the message
+        self.assertEqual(queries, 2)
+
+    @override_settings(CHATS_MEMBERSHIP_CACHE_TTL=60)
+    def test_cached_across_requests(self):
+        """With a TTL the membership is reused until the participants change."""
+        self.count_queries(self.url)
+        _, queries = self.count_queries(self.url)
+        self.assertEqual(queries, 1)
+
+        self.conversation.participants.remove(self.user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 403)
+
+        self.conversation.participants.add(self.user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+
+class BulkMessageTests(ChatsAPITestCase):
+    """
+    Creating many messages in one request.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.conversation = self.add_conversations(1, 0)
+        self.url = reverse(
+            "conversation-messages-bulk",
+            kwargs={"conversation_pk": self.conversation.pk},
+        )
+
+    def post(self, count: int):
+        """POST count messages to the other user, counting the queries."""
+        data = [
+            {"content": f"Offline {number}", "receiver": str(self.other.pk)}
+            for number in range(count)
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, data, format="json")
+        # The backend may split the INSERT to stay under its parameter limit
+        return response, sum(
+            not query["sql"].startswith("INSERT") for query in queries
+        )
+
+    def test_bulk_create(self):
+        """The messages are created and counted with a fixed number of queries."""
+        response, few = self.post(3)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data), 3)
+
+        response, many = self.post(200)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(few, many)
+        self.assertEqual(response.data[-1]["message_count"], 203)
+
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.message_count, 203)
+        self.assertEqual(Message.objects.filter(sender=self.user).count(), 203)
+
+    def test_bulk_create_errors(self):
+        """Any invalid item rejects the whole request, with MessageSerializer's errors."""
+        data = [
+            {"content": "Hi", "receiver": str(self.other.pk)},
+            {"content": "Hi", "receiver": "00000000-0000-0000-0000-000000000000"},
+            {"content": "Hi", "receiver": str(self.user.pk)},
+            {"content": "x" * 501, "receiver": str(self.other.pk)},
+            {"content": "Hi", "receiver": [str(self.other.pk)]},
+        ]
+        response = self.client.post(self.url, data, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data[0], {})
+        self.assertIn("receiver", response.data[1])
+        self.assertEqual(
+            response.data[2]["non_field_errors"],
+            ["Sender and receiver cannot be the same user."],
+        )
+        self.assertEqual(
+            response.data[3]["content"],
+            ["Message content cannot exceed 500 characters."],
+        )
+        self.assertIn("receiver", response.data[4])
+        self.assertFalse(Message.objects.exists())
+
+        response = self.client.post(self.url, [], format="json")
+        self.assertEqual(response.status_code, 400)
@@ -4,9 +4,10 @@ This file contains the ViewSets for the chats application.
 
 from typing import Any
 
-from django.db.models import QuerySet
+from django.db.models import F, Prefetch, QuerySet, Sum
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters, status, viewsets
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.request import Request
 from rest_framework.response import Response
@@ -14,14 +15,16 @@ from rest_framework_simplejwt.views import TokenObtainPairView
 
 from .conversation_filters import ConversationFilter
 from .filters import MessageFilter
+from .membership import is_participant
 from .models import Conversation, Message
 from .permissions import CanAccessMessages, IsActiveUser, IsConversationParticipant
 from .serializers import (
+    BulkMessageSerializer,
     ConversationSerializer,
     CustomTokenSerializer,
     MessageSerializer,
 )
-from .pagination import MessageSetPagination
+from .pagination import MessageCursorPagination
 
 
 class ConversationViewSet(viewsets.ModelViewSet):
@@ -50,8 +53,22 @@ class ConversationViewSet(viewsets.ModelViewSet):
         """
         Override to filter conversations based on the authenticated user.
         Returns conversations where the current user is a participant.
+        Counts are annotated and related rows prefetched, so the number of
+        queries does not grow with the number of conversations or messages.
         """
-        return self.queryset.filter(participants=self.request.user).distinct()
+        return (
+            self.queryset.filter(participants=self.request.user)
+            .distinct()
+            .with_counts()
+            # Most recently active first; a stable order for the pagination
+            .order_by(F("last_message_at").desc(nulls_last=True), "conversation_id")
+            .prefetch_related(
+                "participants",
+                # The prefetched messages get their conversation set to the
+                # annotated instance, which provides their message_count
+                Prefetch("messages", queryset=Message.objects.order_by("sent_at")),
+            )
+        )
 
     def create(self, request: Request, *args: Any, **kwargs: Any) -> Response:
         """
@@ -71,7 +88,7 @@ class MessageViewSet(viewsets.ModelViewSet):
     """
 
     # Get all messages - permissions will filter access
-    queryset = Message.objects.all().distinct()
+    queryset = Message.objects.all()
 
     serializer_class = MessageSerializer
     filter_backends = [
@@ -81,9 +98,10 @@ class MessageViewSet(viewsets.ModelViewSet):
     ]
     filterset_class = MessageFilter
     search_fields = ["message_body", "sender__email", "receiver__email"]
+    # Ignored for lists: the cursor pagination orders by (sent_at, message_id)
     ordering_fields = ["sent_at", "created_at"]
     permission_classes = [IsAuthenticated]
-    pagination_class = MessageSetPagination
+    pagination_class = MessageCursorPagination
 
     # Add permission classes based on the endpoint
     def get_permissions(self):
@@ -109,19 +127,22 @@ class MessageViewSet(viewsets.ModelViewSet):
 
         # For direct message access, return all messages from conversations the user is part of
         if not self.kwargs.get("conversation_pk"):
-            # Get all conversations the user is part of
-            conversations = Conversation.objects.filter(participants=user)
-            if not conversations.exists():
-                return Message.objects.none()
-
-            # Return all messages from those conversations
-            return Message.objects.filter(conversation__in=conversations).distinct()
+            return self.queryset.with_participant(user).with_message_count()
 
         # For nested routes under a conversation, filter by the conversation ID
         conversation_id = self.kwargs.get("conversation_pk")
-        return Message.objects.filter(
-            conversation__conversation_id=conversation_id
-        ).distinct()
+        return self.queryset.filter(conversation_id=conversation_id).with_message_count()
+
+    def get_approximate_count(self) -> int:
+        """
+        Number of messages for the pagination, read from the conversation
+        counters instead of counting the rows. Filters are not applied.
+        """
+        conversations = Conversation.objects.filter(participants=self.request.user)
+        conversation_id = self.kwargs.get("conversation_pk")
+        if conversation_id:
+            conversations = conversations.filter(conversation_id=conversation_id)
+        return conversations.aggregate(total=Sum("message_count"))["total"] or 0
 
     def create(self, request: Request, *args: Any, **kwargs: Any) -> Response:
         """
@@ -132,38 +153,78 @@ class MessageViewSet(viewsets.ModelViewSet):
         conversation_id = self.kwargs.get("conversation_pk")
 
         if conversation_id:
-            try:
-                conversation = Conversation.objects.get(conversation_id=conversation_id)
-
-                # Check if the current user is a participant in the conversation
-                if not conversation.participants.filter(
-                    user_id=request.user.user_id
+            # Check if the current user is a participant in the conversation
+            if not is_participant(request, conversation_id):
+                if not Conversation.objects.filter(
+                    conversation_id=conversation_id
                 ).exists():
                     return Response(
-                        {"detail": "You are not a participant in this conversation."},
-                        status=status.HTTP_403_FORBIDDEN,
+                        {"detail": "Conversation not found."},
+                        status=status.HTTP_404_NOT_FOUND,
                     )
-
-                # Set the sender to the current user
-                data["sender"] = str(request.user.user_id)
-                data["conversation"] = str(conversation.conversation_id)
-
-                serializer = self.get_serializer(data=data)
-                serializer.is_valid(raise_exception=True)
-                serializer.save()
-                return Response(serializer.data, status=status.HTTP_201_CREATED)
-
-            except Conversation.DoesNotExist:
                 return Response(
-                    {"detail": "Conversation not found."},
-                    status=status.HTTP_404_NOT_FOUND,
+                    {"detail": "You are not a participant in this conversation."},
+                    status=status.HTTP_403_FORBIDDEN,
                 )
 
+            # Set the sender to the current user
+            data["sender"] = str(request.user.user_id)
+            data["conversation"] = str(conversation_id)
+
+            serializer = self.get_serializer(data=data)
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+            # The conversation was loaded before post_save incremented its counter
+            serializer.instance.conversation.refresh_from_db(fields=["message_count"])
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+
         return Response(
             {"detail": "Conversation ID is required."},
             status=status.HTTP_400_BAD_REQUEST,
         )
 
+    @action(detail=False, methods=["post"])
+    def bulk(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """
+        Create a list of messages from the current user in one request,
+        e.g. messages written offline. The users and the conversation are
+        fetched with one query each and the messages inserted with
+        bulk_create, so the number of queries does not depend on the number
+        of messages.
+        """
+        conversation_id = self.kwargs.get("conversation_pk")
+        if not conversation_id:
+            return Response(
+                {"detail": "Conversation ID is required."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        data = request.data
+        if isinstance(data, list):
+            # Same defaults as create: the sender is the current user
+            data = [
+                {
+                    **item,
+                    "sender": str(request.user.user_id),
+                    "conversation": str(conversation_id),
+                }
+                if isinstance(item, dict)
+                else item
+                for item in data
+            ]
+
+        # many=True gives MessageSerializer's BulkMessageSerializer, which
+        # validates every item with MessageSerializer's rules
+        serializer = self.get_serializer(
+            data=data,
+            many=True,
+            allow_empty=False,
+            max_length=BulkMessageSerializer.MAX_MESSAGES,
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
 
 class CustomTokenView(TokenObtainPairView):
     """
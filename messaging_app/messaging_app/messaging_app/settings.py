@@ -183,6 +183,9 @@ SIMPLE_JWT = {
 # User chat users as custom user model
 AUTH_USER_MODEL = "chats.User"
 
+# Seconds to cache each user's conversation IDs across requests (0 disables it)
+CHATS_MEMBERSHIP_CACHE_TTL = 0
+
 AUTHENTICATION_BACKENDS = [
     "django.contrib.auth.backends.ModelBackend",
 ]
@@ -1,30 +1,46 @@
 """This module creates a class based context manager to handle opening and closing database connections automatically"""
 
+import asyncio
 import sqlite3
 import os
 import sys
 
+from connection_pool import (
+    DEFAULT_DB_FILE,
+    DEFAULT_POOL_SIZE,
+    close_async_pools,
+    get_async_pool,
+    get_pool,
+)
+
 
 class DatabaseConnection:
     """Context manager for SQLite database connection."""
 
-    def __init__(self, sql_query: str):
-        self.db_file: str = "../users.db"
+    def __init__(
+        self,
+        sql_query: str,
+        db_file: str = DEFAULT_DB_FILE,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        pragmas: dict = None,
+    ):
+        self.db_file: str = db_file
         db_file_exists = os.path.exists(self.db_file)
 
         # Check if the database file exists
         # If not, raise an error
         # to avoid creating a new database
         if not db_file_exists:
-            raise FileNotFoundError("Database file 'users.db' not found.")
+            raise FileNotFoundError(f"Database file '{self.db_file}' not found.")
 
+        self.pool = get_pool(self.db_file, size=pool_size, pragmas=pragmas)
         self.connection = None
         self.cursor = None
         self.query = sql_query
 
     def __enter__(self):
-        """Open the database connection."""
-        self.connection = sqlite3.connect(self.db_file)
+        """Borrow a connection from the shared pool."""
+        self.connection = self.pool.acquire()
 
         try:
             self.cursor = self.connection.cursor()
@@ -35,11 +51,67 @@ class DatabaseConnection:
             return
 
     def __exit__(self, exc_type, exc_value, traceback):
-        """Close the database connection."""
+        """Return the connection to the pool."""
         if self.cursor:
             self.cursor.close()
+            self.cursor = None
         if self.connection:
-            self.connection.close()
+            self.pool.release(self.connection)
+            self.connection = None
+
+
+class AsyncDatabaseConnection:
+    """
+    Async context manager for SQLite database connection.
+    Borrows an aiosqlite connection from the event loop's shared async pool,
+    the cursor it gives back supports `async for` over the rows.
+    """
+
+    def __init__(
+        self,
+        sql_query: str,
+        db_file: str = DEFAULT_DB_FILE,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        pragmas: dict = None,
+    ):
+        self.db_file: str = db_file
+
+        # Check if the database file exists
+        # to avoid creating a new database
+        if not os.path.exists(self.db_file):
+            raise FileNotFoundError(f"Database file '{self.db_file}' not found.")
+
+        self.pool_size = pool_size
+        self.pragmas = pragmas
+        self.pool = None
+        self.connection = None
+        self.cursor = None
+        self.query = sql_query
+
+    async def __aenter__(self):
+        """Borrow a connection from the shared async pool."""
+        self.pool = get_async_pool(self.db_file, size=self.pool_size, pragmas=self.pragmas)
+        self.connection = await self.pool.acquire()
+
+        try:
+            self.cursor = await self.connection.execute(self.query)
+            return self.cursor
+        except sqlite3.Error as e:
+            print(f"An error occurred: {e}")
+            return
+        except BaseException:
+            # e.g. cancellation: __aexit__ does not run, give the connection back here
+            await self.__aexit__(None, None, None)
+            raise
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        """Return the connection to the pool."""
+        if self.cursor:
+            await self.cursor.close()
+            self.cursor = None
+        if self.connection:
+            await self.pool.release(self.connection)
+            self.connection = None
 
 
 if __name__ == "__main__":
@@ -53,3 +125,12 @@ if __name__ == "__main__":
 
         result = cursor.fetchall()
         print(result)
+
+    async def print_users():
+        """Same query through the async context manager."""
+        async with AsyncDatabaseConnection(query) as cursor:
+            async for row in cursor:
+                print(row)
+        await close_async_pools()
+
+    asyncio.run(print_users())
@@ -1,56 +1,246 @@
 """This module creates a reusable context manager that takes a query as input and executes it, managing both connection and the query execution"""
 
+import asyncio
 import sqlite3
 import os
 import sys
+import time
+from collections import namedtuple
+from itertools import islice
+
+from connection_pool import (
+    DEFAULT_DB_FILE,
+    DEFAULT_POOL_SIZE,
+    close_async_pools,
+    get_async_pool,
+    get_pool,
+)
+
+ROW_FORMATS = ("tuple", "record", "columns")
 
 
 class ExecuteQuery:
-    """Context manager for SQLite database connection."""
+    """
+    Context manager for SQLite database connection.
+
+    By default the context manager executes the query on entry and gives back its cursor.
+    Inside the block, on the context manager itself:
+    - iter_rows() reads the rows with fetchmany(chunk_size) as plain tuples,
+      namedtuple records, or one {column: [values]} dict per chunk
+    - with many=True the query is not executed on entry: executemany(rows) runs it
+      once per item, chunk_size items at a time, and the block commits when it
+      exits without an error
+    """
 
-    def __init__(self, sql_query, *sql_args):
-        self.db_file: str = "../users.db"
+    def __init__(
+        self,
+        sql_query,
+        *sql_args,
+        db_file: str = DEFAULT_DB_FILE,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        pragmas: dict = None,
+        many: bool = False,
+        chunk_size: int = 500,
+    ):
+        self.db_file: str = db_file
         db_file_exists = os.path.exists(self.db_file)
 
         # Check if the database file exists
         # If not, raise an error
         # to avoid creating a new database
         if not db_file_exists:
-            raise FileNotFoundError("Database file 'users.db' not found.")
+            raise FileNotFoundError(f"Database file '{self.db_file}' not found.")
 
+        if many and sql_args:
+            raise ValueError("many=True takes its parameters from executemany()")
+
+        self.pool = get_pool(self.db_file, size=pool_size, pragmas=pragmas)
         self.connection = None
         self.cursor = None
         self.query = sql_query
         self.args = sql_args
+        self.many = many
+        self.chunk_size = chunk_size
+        self.total_rowcount = 0
 
     def __enter__(self):
-        """Open the database connection."""
-        self.connection = sqlite3.connect(self.db_file)
+        """Borrow a connection from the shared pool."""
+        self.connection = self.pool.acquire()
 
         try:
             self.cursor = self.connection.cursor()
-            self.cursor.execute(self.query, self.args)
+            if not self.many:
+                self.cursor.execute(self.query, self.args)
             return self.cursor
-        except sqlite3.Error as e:
-            print(f"An error occurred: {e}")
+        except BaseException:
+            # __exit__ does not run when __enter__ fails
+            self.__exit__(None, None, None)
+            raise
+
+    def _check_open(self) -> None:
+        """Raise if used outside the with block, once the connection went back."""
+        if self.connection is None:
+            raise sqlite3.ProgrammingError(
+                "ExecuteQuery can only be used inside its with block"
+            )
+
+    def iter_rows(self, chunk_size: int = None, row_format: str = "tuple"):
+        """Yield the rows one fetchmany chunk at a time."""
+        if row_format not in ROW_FORMATS:
+            raise ValueError(f"row_format must be one of {ROW_FORMATS}")
+        self._check_open()
+        chunk_size = chunk_size or self.chunk_size
+        cursor = self.cursor
+        if cursor.description is None:
             return
 
+        names = [column[0] for column in cursor.description]
+        make_record = None
+        if row_format == "record":
+            # namedtuples have empty __slots__, so records cost no more than tuples
+            make_record = namedtuple("Record", names, rename=True)._make
+
+        while True:
+            # The connection may have gone back to the pool between chunks
+            self._check_open()
+            chunk = cursor.fetchmany(chunk_size)
+            if not chunk:
+                return
+
+            if row_format == "columns":
+                yield dict(zip(names, map(list, zip(*chunk))))
+            elif make_record is not None:
+                yield from map(make_record, chunk)
+            else:
+                yield from chunk
+
+    def executemany(self, rows, chunk_size: int = None) -> int:
+        """
+        Run the query for every item of rows, chunk_size items at a time,
+        and return the number of affected rows. Committed when the block exits.
+        """
+        if not self.many:
+            raise ValueError("executemany() needs ExecuteQuery(..., many=True)")
+        self._check_open()
+        chunk_size = chunk_size or self.chunk_size
+        items = iter(rows)
+        total = 0
+        while chunk := list(islice(items, chunk_size)):
+            self.cursor.executemany(self.query, chunk)
+            total += self.cursor.rowcount
+        self.total_rowcount += total
+        return total
+
     def __exit__(self, exc_type, exc_value, traceback):
-        """Close the database connection."""
+        """Return the connection to the pool."""
         if self.cursor:
             self.cursor.close()
+            self.cursor = None
         if self.connection:
-            self.connection.close()
+            # release() rolls back anything left uncommitted, e.g. after an error
+            if self.many and exc_type is None:
+                self.connection.commit()
+            self.pool.release(self.connection)
+            self.connection = None
+
+
+class AsyncExecuteQuery:
+    """
+    Async context manager that executes a query with its parameters.
+    Borrows an aiosqlite connection from the event loop's shared async pool,
+    the cursor it gives back supports `async for` over the rows,
+    fetched chunk_size rows at a time.
+    """
+
+    def __init__(
+        self,
+        sql_query,
+        *sql_args,
+        db_file: str = DEFAULT_DB_FILE,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        pragmas: dict = None,
+        chunk_size: int = 500,
+    ):
+        self.db_file: str = db_file
+
+        # Check if the database file exists
+        # to avoid creating a new database
+        if not os.path.exists(self.db_file):
+            raise FileNotFoundError(f"Database file '{self.db_file}' not found.")
+
+        self.pool_size = pool_size
+        self.pragmas = pragmas
+        self.pool = None
+        self.connection = None
+        self.cursor = None
+        self.query = sql_query
+        self.args = sql_args
+        self.chunk_size = chunk_size
+
+    async def __aenter__(self):
+        """Borrow a connection from the shared async pool."""
+        self.pool = get_async_pool(self.db_file, size=self.pool_size, pragmas=self.pragmas)
+        self.connection = await self.pool.acquire()
+
+        try:
+            self.cursor = await self.connection.execute(self.query, self.args)
+            self.cursor.iter_chunk_size = self.chunk_size
+            return self.cursor
+        except sqlite3.Error as e:
+            print(f"An error occurred: {e}")
+            return
+        except BaseException:
+            # e.g. cancellation: __aexit__ does not run, give the connection back here
+            await self.__aexit__(None, None, None)
+            raise
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        """Return the connection to the pool."""
+        if self.cursor:
+            await self.cursor.close()
+            self.cursor = None
+        if self.connection:
+            await self.pool.release(self.connection)
+            self.connection = None
 
 
 if __name__ == "__main__":
     # Example usage
     query: str = "SELECT * FROM users WHERE id > ?"
 
-    with ExecuteQuery(query, 4) as cursor:
-        if cursor is None:
-            print("Failed to execute query.")
-            sys.exit(1)
+    try:
+        with ExecuteQuery(query, 4) as cursor:
+            result = cursor.fetchall()
+            print(result)
+    except sqlite3.Error as e:
+        print(f"Failed to execute query: {e}")
+        sys.exit(1)
+
+    # Repeated queries reuse the pooled connection instead of reconnecting
+    start = time.perf_counter()
+    for user_id in range(1000):
+        with ExecuteQuery("SELECT * FROM users WHERE id = ?", user_id % 9 + 1) as cursor:
+            cursor.fetchone()
+    print(f"1000 queries in {time.perf_counter() - start:.4f}s")
+
+    # Stream rows as records without loading the whole result set
+    users = ExecuteQuery("SELECT * FROM users")
+    with users:
+        for user in users.iter_rows(chunk_size=2, row_format="record"):
+            print(user.id, user.email)
+
+    # Bulk update in executemany chunks, committed on exit
+    updates = [(f"user{user_id}@example.com", user_id) for user_id in range(1, 10)]
+    bulk_update = ExecuteQuery("UPDATE users SET email = ? WHERE id = ?", many=True)
+    with bulk_update:
+        updated = bulk_update.executemany(updates, chunk_size=4)
+    print(f"Updated {updated} rows")
+
+    async def print_older_users():
+        """Async iteration over the rows of a query."""
+        async with AsyncExecuteQuery("SELECT * FROM users WHERE id > ?", 4) as cursor:
+            async for row in cursor:
+                print(row)
+        await close_async_pools()
 
-        result = cursor.fetchall()
-        print(result)
+    asyncio.run(print_older_users())
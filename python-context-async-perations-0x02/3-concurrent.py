@@ -4,9 +4,11 @@ This module allows multiple database queries concurrently using asyncio.gather.
 """
 
 import asyncio
-import aiosqlite
 import os
 
+AsyncExecuteQuery = __import__("1-execute").AsyncExecuteQuery
+close_async_pools = __import__("connection_pool").close_async_pools
+
 # Database file
 user_db = "../users.db"
 
@@ -21,19 +23,11 @@ async def async_fetch_users():
     """
     Fetch all users from the database asynchronously.
     """
-    async with aiosqlite.connect(user_db) as db_conn:
-        cursor = await db_conn.cursor()
-
-        # Fetch all rows from the executed query
-        await cursor.execute("SELECT * FROM users")
+    # The connection comes from the shared async pool and goes back on exit
+    async with AsyncExecuteQuery("SELECT * FROM users", db_file=user_db) as cursor:
         result = await cursor.fetchone()
         print(result)
 
-        # Close the cursor and connection
-        # to avoid resource leaks
-        await cursor.close()
-        await db_conn.close()
-
         # Return the result
         return result
 
@@ -42,19 +36,12 @@ async def async_fetch_older_users():
     """
     Fetch users older than 40 from the database asynchronously.
     """
-    async with aiosqlite.connect(user_db) as db_conn:
-        cursor = await db_conn.cursor()
-
-        # Fetch all rows from the executed query
-        await cursor.execute("SELECT * FROM users WHERE age > 40")
+    async with AsyncExecuteQuery(
+        "SELECT * FROM users WHERE age > ?", 40, db_file=user_db
+    ) as cursor:
         result = await cursor.fetchone()
         print(result)
 
-        # Close the cursor and connection
-        # to avoid resource leaks
-        await cursor.close()
-        await db_conn.close()
-
         # Return the result
         return result
 
@@ -63,10 +50,14 @@ async def fetch_concurrently():
     """
     Fetch data concurrently from multiple sources.
     """
-    await asyncio.gather(
-        async_fetch_users(),
-        async_fetch_older_users(),
-    )
+    try:
+        await asyncio.gather(
+            async_fetch_users(),
+            async_fetch_older_users(),
+        )
+    finally:
+        # Close the pooled connections before the event loop stops
+        await close_async_pools()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+This module runs many database queries concurrently over an async connection pool,
+with a concurrency limit, per-query timeouts, latency reporting and read replicas.
+CPU-heavy post-processing of the rows can be sent to a process pool.
+"""
+
+import asyncio
+import hashlib
+import itertools
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from collections import Counter, namedtuple
+
+from connection_pool import DEFAULT_DB_FILE, AsyncConnectionPool
+from offload import DEFAULT_BATCH_SIZE, offload_rows, shutdown_process_pool
+
+ROUTING = ("round_robin", "least_loaded")
+
+# Outcome of one query: rows is None when error is set, db_file is the database that ran it
+QueryResult = namedtuple(
+    "QueryResult",
+    ["index", "query", "params", "rows", "error", "waited", "latency", "db_file"],
+)
+
+
+def is_read_query(query: str) -> bool:
+    """Only plain SELECTs are sent to replicas, anything else goes to the primary."""
+    return query.lstrip().upper().startswith("SELECT")
+
+
+class AsyncQueryExecutor:
+    """
+    Run queries over an async connection pool, at most `concurrency` at a time.
+    With `replicas`, SELECTs are spread over copies of the database using
+    round robin or least-loaded routing, while writes stay on the primary.
+    A `postprocess` function given to run/stream/gather is applied to the rows
+    in `process_pool` (the shared one by default), `batch_size` rows per task.
+    Use it with `async with` so the pooled connections are closed at the end.
+    """
+
+    def __init__(
+        self,
+        db_file: str = DEFAULT_DB_FILE,
+        concurrency: int = 10,
+        timeout: float = None,
+        pragmas: dict = None,
+        replicas: list = None,
+        routing: str = "round_robin",
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        process_pool=None,
+    ):
+        replicas = replicas or []
+        for path in [db_file, *replicas]:
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"Database file '{path}' not found.")
+
+        if routing not in ROUTING:
+            raise ValueError(f"routing must be one of {ROUTING}")
+
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.routing = routing
+        self.batch_size = batch_size
+        self.process_pool = process_pool
+        self.pool = AsyncConnectionPool(db_file, size=concurrency, pragmas=pragmas)
+        self.replica_pools = [
+            AsyncConnectionPool(path, size=concurrency, pragmas=pragmas)
+            for path in replicas
+        ]
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._next_replica = itertools.cycle(self.replica_pools)
+        # Queries currently running on each pool, for least-loaded routing
+        self._in_flight = {pool: 0 for pool in [self.pool, *self.replica_pools]}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        for pool in self._in_flight:
+            await pool.close()
+
+    def _route(self, query: str, use_primary: bool) -> AsyncConnectionPool:
+        """Pick the pool that runs a query."""
+        if use_primary or not self.replica_pools or not is_read_query(query):
+            return self.pool
+        if self.routing == "least_loaded":
+            return min(self.replica_pools, key=self._in_flight.__getitem__)
+        return next(self._next_replica)
+
+    async def _fetch(self, pool: AsyncConnectionPool, query: str, params) -> list:
+        async with pool.connection() as connection:
+            try:
+                cursor = await connection.execute(query, params)
+                rows = await cursor.fetchall()
+                await cursor.close()
+            except asyncio.CancelledError:
+                # Cancelling only stops the await: interrupt the statement still
+                # running in aiosqlite's thread before the connection goes back
+                await connection.interrupt()
+                raise
+            if connection.in_transaction:
+                await connection.commit()
+            return rows
+
+    async def run(
+        self,
+        query: str,
+        params=(),
+        timeout: float = None,
+        index: int = 0,
+        use_primary: bool = False,
+        postprocess=None,
+    ):
+        """
+        Run one query and return a QueryResult.
+        Pass use_primary=True to read from the primary, e.g. right after a write.
+        postprocess(rows) runs in a worker process once the connection is released.
+        Errors and timeouts are reported in the result instead of being raised.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        queued_at = time.perf_counter()
+
+        async with self._semaphore:
+            pool = self._route(query, use_primary)
+            # Counted right away: wait_for starts _fetch in a task that runs later,
+            # and the next queries of a burst are routed before it does
+            self._in_flight[pool] += 1
+            started_at = time.perf_counter()
+            rows, error = None, None
+            try:
+                rows = await asyncio.wait_for(self._fetch(pool, query, params), timeout)
+            except (sqlite3.Error, asyncio.TimeoutError) as e:
+                error = e
+            finally:
+                self._in_flight[pool] -= 1
+            finished_at = time.perf_counter()
+
+        if postprocess is not None and error is None:
+            try:
+                rows = await offload_rows(
+                    postprocess, rows, self.batch_size, self.process_pool
+                )
+            except Exception as e:
+                rows, error = None, e
+
+        return QueryResult(
+            index,
+            query,
+            params,
+            rows,
+            error,
+            started_at - queued_at,
+            finished_at - started_at,
+            pool.db_file,
+        )
+
+    async def stream(self, queries, timeout: float = None, postprocess=None):
+        """
+        Run every query and yield the QueryResults in completion order.
+        A query is either a SQL string or a (sql, params) pair.
+        Closing the generator early, e.g. with contextlib.aclosing,
+        cancels the queries that have not finished.
+        """
+        tasks = []
+        for index, item in enumerate(queries):
+            query, params = (item, ()) if isinstance(item, str) else item
+            tasks.append(
+                asyncio.create_task(
+                    self.run(query, params, timeout, index=index, postprocess=postprocess)
+                )
+            )
+
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def gather(self, queries, timeout: float = None, postprocess=None) -> list:
+        """Run every query and return the QueryResults in submission order."""
+        results = [
+            result async for result in self.stream(queries, timeout, postprocess)
+        ]
+        return sorted(results, key=lambda result: result.index)
+
+
+def hash_emails(rows):
+    """Example of a CPU-heavy transform: a slow digest of every user's email."""
+    return [
+        (row[0], hashlib.pbkdf2_hmac("sha256", row[4].encode(), b"salt", 20000).hex())
+        for row in rows
+    ]
+
+
+async def fetch_concurrently(queries, concurrency: int = 10, timeout: float = 5.0):
+    """
+    Fetch data for many queries concurrently, printing each result as it completes.
+    """
+    async with AsyncQueryExecutor(concurrency=concurrency, timeout=timeout) as executor:
+        async for result in executor.stream(queries):
+            status = f"error: {result.error}" if result.error else f"{len(result.rows)} rows"
+            print(
+                f"#{result.index} {status} "
+                f"(waited {result.waited * 1000:.1f}ms, ran {result.latency * 1000:.1f}ms)"
+            )
+
+
+if __name__ == "__main__":
+    # Example usage: fan out a few hundred report queries
+    report_queries = [
+        ("SELECT * FROM users WHERE id = ?", (user_id % 9 + 1,)) for user_id in range(200)
+    ]
+    report_queries += ["SELECT * FROM users", "SELECT * FROM users WHERE age > 40"]
+
+    asyncio.run(fetch_concurrently(report_queries, concurrency=8))
+
+    async def fetch_from_replicas(replicas):
+        """Spread the report queries over copies of the database."""
+        async with AsyncQueryExecutor(
+            concurrency=8, replicas=replicas, routing="least_loaded"
+        ) as executor:
+            results = await executor.gather(report_queries)
+        print(Counter(os.path.basename(result.db_file) for result in results))
+
+    # Example usage: copies of users.db stand in for read replicas
+    with tempfile.TemporaryDirectory() as replica_dir:
+        replica_files = []
+        for number in range(3):
+            replica_files.append(os.path.join(replica_dir, f"replica{number}.db"))
+            shutil.copy(DEFAULT_DB_FILE, replica_files[-1])
+
+        asyncio.run(fetch_from_replicas(replica_files))
+
+    async def fetch_and_hash():
+        """Hash the emails in worker processes while the loop keeps serving queries."""
+        async with AsyncQueryExecutor(concurrency=8, batch_size=3) as executor:
+            result = await executor.run("SELECT * FROM users", postprocess=hash_emails)
+        print(result.rows[:2])
+
+    # Example usage: offload post-processing to the process pool
+    asyncio.run(fetch_and_hash())
+    shutdown_process_pool()
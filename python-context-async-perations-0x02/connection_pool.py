@@ -0,0 +1,233 @@
+"""This module provides shared pools of SQLite connections for the sync and async helpers"""
+
+import asyncio
+import os
+import queue
+import sqlite3
+import threading
+import weakref
+from contextlib import asynccontextmanager
+
+import aiosqlite
+
+DEFAULT_DB_FILE: str = "../users.db"
+DEFAULT_POOL_SIZE: int = 5
+
+# WAL lets readers run while a write is in progress, mmap_size maps up to 256MB of the file
+DEFAULT_PRAGMAS: dict = {
+    "journal_mode": "WAL",
+    "mmap_size": 256 * 1024 * 1024,
+}
+
+
+class ConnectionPool:
+    """A fixed size pool of SQLite connections to one database file."""
+
+    def __init__(
+        self,
+        db_file: str = DEFAULT_DB_FILE,
+        size: int = DEFAULT_POOL_SIZE,
+        pragmas: dict = None,
+        timeout: float = 5.0,
+    ):
+        self.db_file = db_file
+        self.size = size
+        self.pragmas = DEFAULT_PRAGMAS if pragmas is None else pragmas
+        self.timeout = timeout
+
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a new connection and apply the pragmas."""
+        # Connections are handed between threads, one user at a time
+        connection = sqlite3.connect(self.db_file, check_same_thread=False)
+        for name, value in self.pragmas.items():
+            connection.execute(f"PRAGMA {name} = {value}")
+        return connection
+
+    def acquire(self) -> sqlite3.Connection:
+        """Borrow a connection, opening one if the pool is not full yet."""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+
+        if can_create:
+            try:
+                return self._connect()
+            except sqlite3.Error:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(
+                f"No connection to {self.db_file} available after {self.timeout}s"
+            ) from None
+
+    def release(self, connection: sqlite3.Connection) -> None:
+        """Give a connection back, dropping any uncommitted changes."""
+        if connection.in_transaction:
+            connection.rollback()
+        self._idle.put_nowait(connection)
+
+    def close(self) -> None:
+        """Close the idle connections."""
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            connection.close()
+            with self._lock:
+                self._created -= 1
+
+
+_pools: dict = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(
+    db_file: str = DEFAULT_DB_FILE,
+    size: int = DEFAULT_POOL_SIZE,
+    pragmas: dict = None,
+) -> ConnectionPool:
+    """
+    Return the shared pool for a database file, creating it on first use.
+    size and pragmas only apply when the pool is created.
+    """
+    key = os.path.abspath(db_file)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(db_file, size=size, pragmas=pragmas)
+            _pools[key] = pool
+        return pool
+
+
+def close_pools() -> None:
+    """Close the idle connections of every shared pool."""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+class AsyncConnectionPool:
+    """
+    A fixed size pool of aiosqlite connections to one database file.
+    The pool belongs to the event loop it is first used in.
+    """
+
+    def __init__(
+        self,
+        db_file: str = DEFAULT_DB_FILE,
+        size: int = DEFAULT_POOL_SIZE,
+        pragmas: dict = None,
+        timeout: float = 5.0,
+    ):
+        self.db_file = db_file
+        self.size = size
+        self.pragmas = DEFAULT_PRAGMAS if pragmas is None else pragmas
+        self.timeout = timeout
+
+        self._idle = asyncio.LifoQueue(maxsize=size)
+        self._created = 0
+
+    async def _connect(self) -> aiosqlite.Connection:
+        """Open a new connection and apply the pragmas."""
+        connection = await aiosqlite.connect(self.db_file)
+        for name, value in self.pragmas.items():
+            # Close the cursor: a statement left open keeps interrupt() in effect
+            cursor = await connection.execute(f"PRAGMA {name} = {value}")
+            await cursor.close()
+        return connection
+
+    async def acquire(self, timeout: float = None) -> aiosqlite.Connection:
+        """
+        Borrow a connection, waiting up to timeout seconds (the pool's
+        timeout by default) for one if the pool is exhausted.
+        """
+        try:
+            return self._idle.get_nowait()
+        except asyncio.QueueEmpty:
+            pass
+
+        if self._created < self.size:
+            self._created += 1
+            try:
+                return await self._connect()
+            except BaseException:
+                self._created -= 1
+                raise
+
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            return await asyncio.wait_for(self._idle.get(), timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(
+                f"No connection to {self.db_file} available after {timeout}s"
+            ) from None
+
+    async def release(self, connection: aiosqlite.Connection) -> None:
+        """Give a connection back, dropping any uncommitted changes."""
+        if connection.in_transaction:
+            await connection.rollback()
+        self._idle.put_nowait(connection)
+
+    @asynccontextmanager
+    async def connection(self):
+        """Borrow a connection for the duration of an async with block."""
+        connection = await self.acquire()
+        try:
+            yield connection
+        finally:
+            await self.release(connection)
+
+    async def close(self) -> None:
+        """
+        Close the idle connections.
+        aiosqlite runs each connection on a worker thread, so await this
+        before the event loop finishes or the interpreter waits on them at exit.
+        """
+        while not self._idle.empty():
+            connection = self._idle.get_nowait()
+            self._created -= 1
+            await connection.close()
+
+
+_async_pools = weakref.WeakKeyDictionary()
+
+
+def get_async_pool(
+    db_file: str = DEFAULT_DB_FILE,
+    size: int = DEFAULT_POOL_SIZE,
+    pragmas: dict = None,
+) -> AsyncConnectionPool:
+    """
+    Return the shared async pool of the running event loop for a database file.
+    size and pragmas only apply when the pool is created.
+    """
+    pools = _async_pools.setdefault(asyncio.get_running_loop(), {})
+    key = os.path.abspath(db_file)
+    pool = pools.get(key)
+    if pool is None:
+        pool = AsyncConnectionPool(db_file, size=size, pragmas=pragmas)
+        pools[key] = pool
+    return pool
+
+
+async def close_async_pools() -> None:
+    """Close the idle connections of every async pool of the running event loop."""
+    pools = _async_pools.pop(asyncio.get_running_loop(), {})
+    for pool in pools.values():
+        await pool.close()
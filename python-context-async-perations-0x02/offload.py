@@ -0,0 +1,64 @@
+"""This module moves CPU-heavy post-processing of query results to a process pool, keeping the event loop responsive"""
+
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+DEFAULT_BATCH_SIZE: int = 1000
+
+_process_pool = None
+
+
+def get_process_pool(max_workers: int = None) -> ProcessPoolExecutor:
+    """Return the shared process pool, creating it on first use."""
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=max_workers or os.cpu_count())
+    return _process_pool
+
+
+def shutdown_process_pool() -> None:
+    """Stop the worker processes of the shared pool."""
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown()
+        _process_pool = None
+
+
+def _process_batch(func, batch: list) -> list:
+    """Run in a worker process: apply func to one batch of rows."""
+    return list(func(batch))
+
+
+async def offload_rows(
+    func,
+    rows: list,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    executor: ProcessPoolExecutor = None,
+) -> list:
+    """
+    Apply func to the rows in a process pool and return the combined results.
+
+    func takes a list of rows and returns an iterable of results, and must be
+    defined at module level so it can be pickled. Rows are sent as plain tuples
+    in batches of batch_size, so each worker call pays for one pickle round trip
+    per batch instead of one per row.
+    """
+    if not rows:
+        return []
+
+    loop = asyncio.get_running_loop()
+    executor = executor or get_process_pool()
+    batches = [
+        # sqlite3.Row and other row types are turned into plain tuples
+        [tuple(row) for row in rows[start : start + batch_size]]
+        for start in range(0, len(rows), batch_size)
+    ]
+    processed = await asyncio.gather(
+        *(loop.run_in_executor(executor, _process_batch, func, batch) for batch in batches)
+    )
+
+    results = []
+    for batch_result in processed:
+        results.extend(batch_result)
+    return results
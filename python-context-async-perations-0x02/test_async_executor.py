@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""Tests for the async query executor of 4-async_executor.py"""
+
+import asyncio
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import unittest
+
+AsyncQueryExecutor = __import__("4-async_executor").AsyncQueryExecutor
+
+# Counts to fifty million, far longer than the timeouts below
+SLOW_QUERY = (
+    "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 50000000)"
+    " SELECT count(*) FROM c"
+)
+
+
+class TestAsyncQueryExecutor(unittest.IsolatedAsyncioTestCase):
+    """Tests the AsyncQueryExecutor class"""
+
+    def setUp(self):
+        """Create an empty database file"""
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.db_file = os.path.join(self.directory.name, "test.db")
+        sqlite3.connect(self.db_file).close()
+
+    async def test_query_after_timeout(self):
+        """A timed out query is interrupted, its connection serves the next one"""
+        async with AsyncQueryExecutor(self.db_file, concurrency=1) as executor:
+            slow = await executor.run(SLOW_QUERY, timeout=0.2)
+            self.assertIsInstance(slow.error, TimeoutError)
+
+            started = time.perf_counter()
+            result = await executor.run("SELECT 2", timeout=1)
+            self.assertIsNone(result.error)
+            self.assertEqual(result.rows, [(2,)])
+            self.assertLess(time.perf_counter() - started, 1)
+
+    async def test_least_loaded_burst(self):
+        """A burst of reads with a timeout is spread over the replicas"""
+        replicas = []
+        for number in range(4):
+            replicas.append(os.path.join(self.directory.name, f"r{number}.db"))
+            shutil.copy(self.db_file, replicas[-1])
+
+        async with AsyncQueryExecutor(
+            self.db_file,
+            concurrency=8,
+            timeout=5.0,
+            replicas=replicas,
+            routing="least_loaded",
+        ) as executor:
+            results = await asyncio.gather(
+                *(executor.run("SELECT 1") for _ in range(8))
+            )
+
+        self.assertEqual(len({result.db_file for result in results}), len(replicas))
+
+
+if __name__ == "__main__":
+    unittest.main()
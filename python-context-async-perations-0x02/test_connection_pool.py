@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""Tests for the async connection pool and the async context managers"""
+
+import asyncio
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+AsyncConnectionPool = __import__("connection_pool").AsyncConnectionPool
+close_async_pools = __import__("connection_pool").close_async_pools
+get_async_pool = __import__("connection_pool").get_async_pool
+AsyncDatabaseConnection = __import__("0-databaseconnection").AsyncDatabaseConnection
+
+
+class TestAsyncConnectionPool(unittest.IsolatedAsyncioTestCase):
+    """Tests the AsyncConnectionPool class"""
+
+    def setUp(self):
+        """Create an empty database file"""
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.db_file = os.path.join(self.directory.name, "test.db")
+        sqlite3.connect(self.db_file).close()
+
+    async def test_acquire_timeout(self):
+        """An exhausted pool raises TimeoutError instead of waiting forever"""
+        pool = AsyncConnectionPool(self.db_file, size=1)
+        connection = await pool.acquire()
+        try:
+            with self.assertRaises(TimeoutError):
+                await pool.acquire(timeout=0.05)
+        finally:
+            await pool.release(connection)
+            await pool.close()
+
+    async def test_failed_enter_releases(self):
+        """A connection is given back when entering the block fails"""
+        pool = get_async_pool(self.db_file, size=1, pragmas={})
+        self.addAsyncCleanup(close_async_pools)
+
+        with patch("aiosqlite.Connection.execute", side_effect=ValueError):
+            for _ in range(2):
+                with self.assertRaises(ValueError):
+                    async with AsyncDatabaseConnection("SELECT 1", db_file=self.db_file):
+                        pass
+
+        connection = await asyncio.wait_for(pool.acquire(), 1)
+        await pool.release(connection)
+
+
+if __name__ == "__main__":
+    unittest.main()
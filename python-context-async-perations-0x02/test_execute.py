@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""Tests for the ExecuteQuery context manager of 1-execute.py"""
+
+import os
+import sqlite3
+import tempfile
+import unittest
+
+ExecuteQuery = __import__("1-execute").ExecuteQuery
+close_pools = __import__("connection_pool").close_pools
+
+
+class TestExecuteQuery(unittest.TestCase):
+    """Tests the ExecuteQuery class"""
+
+    def setUp(self):
+        """Create a database with a few users"""
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.addCleanup(close_pools)
+        self.db_file = os.path.join(self.directory.name, "users.db")
+        with sqlite3.connect(self.db_file) as connection:
+            connection.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, email TEXT)")
+            connection.executemany(
+                "INSERT INTO users VALUES (?, ?)",
+                [(user_id, f"user{user_id}@example.com") for user_id in range(1, 6)],
+            )
+        connection.close()
+
+    def emails(self):
+        """Emails in the database, read with a separate connection"""
+        with sqlite3.connect(self.db_file) as connection:
+            rows = connection.execute("SELECT email FROM users ORDER BY id").fetchall()
+        connection.close()
+        return [email for email, in rows]
+
+    def test_iter_rows(self):
+        """Rows are read in chunks, as records or columns"""
+        query = ExecuteQuery("SELECT * FROM users WHERE id > ?", 3, db_file=self.db_file)
+        with query:
+            records = list(query.iter_rows(chunk_size=1, row_format="record"))
+        self.assertEqual([record.id for record in records], [4, 5])
+
+        query = ExecuteQuery("SELECT id FROM users", db_file=self.db_file)
+        with query:
+            chunks = list(query.iter_rows(chunk_size=3, row_format="columns"))
+        self.assertEqual(chunks, [{"id": [1, 2, 3]}, {"id": [4, 5]}])
+
+    def test_iter_rows_after_block(self):
+        """Rows cannot be read once the connection went back to the pool"""
+        query = ExecuteQuery("SELECT * FROM users", db_file=self.db_file)
+        with query:
+            rows = query.iter_rows(chunk_size=2)
+            next(rows)
+
+        with self.assertRaises(sqlite3.ProgrammingError):
+            list(rows)
+
+    def test_executemany(self):
+        """Bulk writes run inside the block and are committed on exit"""
+        query = ExecuteQuery(
+            "UPDATE users SET email = ? WHERE id = ?", db_file=self.db_file, many=True
+        )
+        with query:
+            updated = query.executemany(
+                [(f"new{user_id}@example.com", user_id) for user_id in range(1, 6)],
+                chunk_size=2,
+            )
+
+        self.assertEqual(updated, 5)
+        self.assertEqual(self.emails()[0], "new1@example.com")
+
+    def test_executemany_error(self):
+        """A failing bulk write raises and nothing of it is committed"""
+        query = ExecuteQuery(
+            "INSERT INTO users VALUES (?, ?)", db_file=self.db_file, many=True
+        )
+        with self.assertRaises(sqlite3.IntegrityError):
+            with query:
+                query.executemany([(6, "six@example.com"), (1, "dup@example.com")])
+
+        self.assertEqual(len(self.emails()), 5)
+
+    def test_execute_error(self):
+        """A failing query raises instead of giving back None"""
+        with self.assertRaises(sqlite3.OperationalError):
+            with ExecuteQuery("SELECT * FROM missing", db_file=self.db_file):
+                pass
+
+
+if __name__ == "__main__":
+    unittest.main()
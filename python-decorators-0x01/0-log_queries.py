@@ -4,6 +4,7 @@ This script creates a decorator that logs database queries executed by any funct
 
 import sqlite3
 import functools
+import inspect
 import logging
 from datetime import datetime
 from typing import Any
@@ -26,6 +27,30 @@ def log_queries(f):
     Decorator to log SQL queries executed by the function
     """
 
+    if inspect.iscoroutinefunction(f):
+
+        @functools.wraps(f)
+        async def async_wrapper(*args, **kwargs):
+            query = args[0] if args else kwargs.get("query")
+
+            # Check if the query is provided
+            if not query:
+                logging.error("No query provided to log.")
+                return None
+
+            logging.info(f"Query to be exexuted: {query}")
+            try:
+                result: Any = await f(*args, **kwargs)
+                logging.info(f"Query executed successfully: {result}")
+            except Exception as e:
+                logging.error(f"Error executing query: {query}")
+                logging.exception(e)
+                return None
+
+            return result
+
+        return async_wrapper
+
     @functools.wraps(f)
     def wrapper(*args, **kwargs):
         query = args[0] if args else kwargs.get("query")
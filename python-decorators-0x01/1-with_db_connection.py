@@ -1,10 +1,16 @@
 """This module provides a decorator to manage SQLite database connections"""
 
+import asyncio
 import functools
+import inspect
 import logging
 import sqlite3
+import weakref
+from contextvars import ContextVar
 from datetime import datetime
 
+import aiosqlite
+
 #### decorator to lof SQL queries
 logfile = f"logs/dbqquery-{datetime.now().strftime('%Y-%m-%d')}.log"
 logging.basicConfig(
@@ -16,14 +22,86 @@ logging.basicConfig(
     filemode="a",
 )
 
+userdb: str = "users.db"
+
+# Connection shared by every call inside a scope such as transaction_batch()
+bound_connection: ContextVar = ContextVar("bound_connection", default=None)
+
+# Idle aiosqlite connections kept for reuse by async callers, per event loop:
+# a connection opened under one asyncio.run() is not handed out under the next
+ASYNC_POOL_SIZE: int = 5
+_async_pools = weakref.WeakKeyDictionary()
+
+
+def _async_pool() -> list:
+    """Idle connections of the running event loop."""
+    return _async_pools.setdefault(asyncio.get_running_loop(), [])
+
+
+async def acquire_async_connection() -> aiosqlite.Connection:
+    """Check out an idle aiosqlite connection or open a new one."""
+    pool = _async_pool()
+    if pool:
+        return pool.pop()
+    conn = await aiosqlite.connect(userdb)
+    logging.info("Connection to %s successful", userdb)
+    return conn
+
+
+async def release_async_connection(conn: aiosqlite.Connection) -> None:
+    """Return a connection to the pool, closing it if the pool is full."""
+    if conn.in_transaction:
+        await conn.rollback()
+    pool = _async_pool()
+    if len(pool) < ASYNC_POOL_SIZE:
+        pool.append(conn)
+    else:
+        await conn.close()
+
+
+async def close_async_pool() -> None:
+    """
+    Close every idle pooled connection of the running event loop.
+    aiosqlite runs each connection on a worker thread, so await this
+    before the event loop finishes or the interpreter waits on them at exit.
+    """
+    pool = _async_pools.pop(asyncio.get_running_loop(), [])
+    while pool:
+        await pool.pop().close()
+
 
 def with_db_connection(func):
     """your code goes here"""
-    userdb: str = "users.db"
+
+    if inspect.iscoroutinefunction(func):
+
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            # Reuse a connection passed in by another decorator
+            if args and isinstance(args[0], aiosqlite.Connection):
+                return await func(*args, **kwargs)
+
+            conn = await acquire_async_connection()
+            try:
+                result = await func(conn, *args, **kwargs)
+                logging.info("Query successful: %s", result)
+                return result
+            except sqlite3.Error as e:
+                logging.error("Connection to %s failed. Error: %s", userdb, e)
+                raise
+            finally:
+                await release_async_connection(conn)
+
+        return async_wrapper
 
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         # print(*args)
+        bound = bound_connection.get()
+        if bound is not None and not (args and isinstance(args[0], sqlite3.Connection)):
+            # The scope owns the connection, so leave it open
+            return func(bound, *args, **kwargs)
+
         conn = None
         try:
             conn = sqlite3.connect(userdb)
@@ -55,7 +133,23 @@ def get_user_by_id(conn, user_id):
     return cursor.fetchone()
 
 
+@with_db_connection
+async def async_get_user_by_id(conn, user_id):
+    cursor = await conn.execute("SELECT * FROM users WHERE id = ?", (user_id,))
+    return await cursor.fetchone()
+
+
+async def fetch_users_concurrently(*user_ids):
+    """Fetch several users concurrently through the async connection pool."""
+    try:
+        return await asyncio.gather(*(async_get_user_by_id(i) for i in user_ids))
+    finally:
+        await close_async_pool()
+
+
 #### Fetch user by ID with automatic connection handling
 
 user = get_user_by_id(user_id=1)
 print(user)
+
+print(asyncio.run(fetch_users_concurrently(1, 2, 3)))
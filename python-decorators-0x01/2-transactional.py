@@ -1,11 +1,101 @@
 """Module contains a decorator that manages database transactions by automatically committing or rolling back changes"""
 
 import functools
+import inspect
 import logging
 import sqlite3
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import aiosqlite
 
 with_db_connection = __import__("1-with_db_connection").with_db_connection
 get_user_by_id = __import__("1-with_db_connection").get_user_by_id
+bound_connection = __import__("1-with_db_connection").bound_connection
+userdb = __import__("1-with_db_connection").userdb
+
+# Batch collecting the writes of the current transaction_batch() scope
+current_batch: ContextVar = ContextVar("current_batch", default=None)
+
+
+class TransactionBatch:
+    """
+    Group the writes of several transactional calls into one commit.
+    Each call runs inside its own savepoint so a failing item is rolled back
+    on its own, and the batch commits every max_size items or max_wait seconds.
+    """
+
+    def __init__(self, connection: sqlite3.Connection, max_size: int, max_wait: float):
+        self.connection = connection
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self.pending = 0
+        self.committed = 0
+        self.started_at = time.monotonic()
+
+    def run(self, func, *args, **kwargs):
+        """Run one item of the batch inside a savepoint."""
+        if not self.connection.in_transaction:
+            self.connection.execute("BEGIN")
+            self.started_at = time.monotonic()
+
+        self.connection.execute("SAVEPOINT batch_item")
+        try:
+            result = func(*args, **kwargs)
+        except sqlite3.Error as e:
+            self.connection.execute("ROLLBACK TO SAVEPOINT batch_item")
+            self.connection.execute("RELEASE SAVEPOINT batch_item")
+            logging.error("Batch item failed and was rolled back. Error: %s", e)
+            raise
+        self.connection.execute("RELEASE SAVEPOINT batch_item")
+
+        self.pending += 1
+        if (
+            self.pending >= self.max_size
+            or time.monotonic() - self.started_at >= self.max_wait
+        ):
+            self.flush()
+        return result
+
+    def flush(self) -> None:
+        """Commit the pending items."""
+        if self.connection.in_transaction:
+            self.connection.commit()
+            logging.info("Batch of %d writes committed.", self.pending)
+        self.committed += self.pending
+        self.pending = 0
+
+    def rollback(self) -> None:
+        """Drop the pending items."""
+        if self.connection.in_transaction:
+            self.connection.rollback()
+            logging.error("Batch of %d writes rolled back.", self.pending)
+        self.pending = 0
+
+
+@contextmanager
+def transaction_batch(max_size: int = 100, max_wait: float = 1.0):
+    """
+    Commit the transactional writes made inside the scope in groups.
+    with_db_connection hands the scope's connection to every call, pending
+    writes are committed on exit and rolled back if the scope raises.
+    Groups flushed before an error stay committed.
+    """
+    connection = sqlite3.connect(userdb)
+    batch = TransactionBatch(connection, max_size, max_wait)
+    connection_token = bound_connection.set(connection)
+    batch_token = current_batch.set(batch)
+    try:
+        yield batch
+        batch.flush()
+    except BaseException:
+        batch.rollback()
+        raise
+    finally:
+        current_batch.reset(batch_token)
+        bound_connection.reset(connection_token)
+        connection.close()
 
 
 def transactional(func):
@@ -13,6 +103,29 @@ def transactional(func):
     Decorator to manage database transactions
     """
 
+    if inspect.iscoroutinefunction(func):
+
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            if not args or not isinstance(args[0], aiosqlite.Connection):
+                raise ValueError("First argument must be a database connection")
+
+            connection = args[0]
+            try:
+                logging.info("Starting transaction...")
+                result = await func(*args, **kwargs)
+                await connection.commit()
+                logging.info("Transaction committed successfully.")
+                return result
+            except sqlite3.Error as e:
+                await connection.rollback()
+                logging.error("Transaction failed. Changes rolled back.")
+                logging.error("Error: %s", e)
+                logging.exception(e)
+                raise e
+
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         # Make sure we have a connection as the first argument
@@ -20,6 +133,12 @@ def transactional(func):
             raise ValueError("First argument must be a database connection")
 
         connection = args[0]
+
+        # Inside transaction_batch() the batch decides when to commit
+        batch = current_batch.get()
+        if batch is not None and batch.connection is connection:
+            return batch.run(func, *args, **kwargs)
+
         try:
             logging.info("Starting transaction...")
             result = func(*args, **kwargs)
@@ -49,3 +168,15 @@ def update_user_email(conn, user_id, new_email):
 #### Update user's email with automatic transaction handling
 update_user_email(user_id=1, new_email="Crawford_Cartwright@live.com")
 print(get_user_by_id(1))
+
+#### Update many emails with one commit per batch instead of one per update
+start = time.perf_counter()
+for user_id in range(1, 10):
+    update_user_email(user_id=user_id, new_email=f"user{user_id}@example.com")
+print(f"Committed one by one: {time.perf_counter() - start:.4f}s")
+
+start = time.perf_counter()
+with transaction_batch(max_size=50, max_wait=1.0):
+    for user_id in range(1, 10):
+        update_user_email(user_id=user_id, new_email=f"user{user_id}@example.org")
+print(f"Committed in a batch: {time.perf_counter() - start:.4f}s")
@@ -1,6 +1,8 @@
 """This module contains decorator that retries database operations if they fail due to transient errors"""
 
+import asyncio
 import functools
+import inspect
 import logging
 import sqlite3
 import time
@@ -16,6 +18,26 @@ def retry_on_failure(retries=3, delay=1):
     """
 
     def decorator(func):
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                for attempt in range(retries):
+                    try:
+                        logging.info("Attempt %d of %d", attempt + 1, retries)
+                        result = await func(*args, **kwargs)
+                        logging.info("Query successful: %s", result)
+                        return result
+                    except sqlite3.Error as e:
+                        if attempt < retries - 1:
+                            # Back off without blocking the event loop
+                            await asyncio.sleep(delay)
+                        else:
+                            logging.error("All attempts failed. Error: %s", e)
+                            raise
+
+            return async_wrapper
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
             for attempt in range(retries):
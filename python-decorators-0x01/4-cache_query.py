@@ -1,6 +1,8 @@
 """This module provides a decorator to manage SQLite database connections using a cache for query results"""
 
 from hashlib import sha256
+import asyncio
+import inspect
 import logging
 import time
 import sqlite3
@@ -9,7 +11,11 @@ import functools
 
 query_cache = {}
 
+# Futures for async queries currently being executed, keyed by query hash
+inflight_queries = {}
+
 with_db_connection = __import__("1-with_db_connection").with_db_connection
+close_async_pool = __import__("1-with_db_connection").close_async_pool
 
 
 def cache_query(func):
@@ -17,6 +23,45 @@ def cache_query(func):
     Decorator to cache query results.
     """
 
+    if inspect.iscoroutinefunction(func):
+
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            query = kwargs.get("query")
+            query_hash = sha256(query.encode()).hexdigest()
+
+            if query_hash in query_cache:
+                logging.info("Using cached result for query: %s", query)
+                return query_cache.get(query_hash)
+
+            # Single flight: wait for a concurrent caller already running the query
+            pending = inflight_queries.get(query_hash)
+            if pending is not None:
+                logging.info("Waiting for in-flight query: %s", query)
+                return await asyncio.shield(pending)
+
+            future = asyncio.get_running_loop().create_future()
+            inflight_queries[query_hash] = future
+            try:
+                query_result = await func(*args, **kwargs)
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except Exception as e:
+                future.set_exception(e)
+                # Mark the exception as retrieved when nobody else was waiting
+                future.exception()
+                raise
+            else:
+                query_cache[query_hash] = query_result
+                future.set_result(query_result)
+                logging.info("Cached result for query: %s", query_hash)
+                return query_result
+            finally:
+                del inflight_queries[query_hash]
+
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         # Check if the query is already cached
@@ -48,8 +93,29 @@ def fetch_users_with_cache(conn, query):
     return cursor.fetchall()
 
 
+@with_db_connection
+@cache_query
+async def async_fetch_users_with_cache(conn, query):
+    cursor = await conn.execute(query)
+    return await cursor.fetchall()
+
+
+async def fetch_users_concurrently():
+    """Concurrent callers of the same query share a single execution."""
+    try:
+        return await asyncio.gather(
+            async_fetch_users_with_cache(query="SELECT * FROM users WHERE id > 5"),
+            async_fetch_users_with_cache(query="SELECT * FROM users WHERE id > 5"),
+        )
+    finally:
+        await close_async_pool()
+
+
 #### First call will cache the result
 users = fetch_users_with_cache(query="SELECT * FROM users")
 
 #### Second call will use the cached result
 users_again = fetch_users_with_cache(query="SELECT * FROM users")
+
+#### Concurrent async calls run the query once
+recent_users, recent_users_again = asyncio.run(fetch_users_concurrently())
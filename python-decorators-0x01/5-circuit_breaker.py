@@ -0,0 +1,196 @@
+"""This module contains a circuit breaker decorator that short-circuits database calls while the database is unhealthy"""
+
+import functools
+import inspect
+import logging
+import sqlite3
+import threading
+import time
+from collections import deque
+
+with_db_connection = __import__("1-with_db_connection").with_db_connection
+retry_on_failure = __import__("3-retry_on_failure").retry_on_failure
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CircuitOpenError(RuntimeError):
+    """
+    Raised when a call is rejected because the circuit is open.
+    Not a sqlite3.Error, so retry_on_failure does not retry it.
+    """
+
+
+class CircuitBreaker:
+    """
+    Track the outcome of calls and open the circuit when the failure rate
+    inside the sliding window goes above the threshold.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: float = 0.5,
+        window: float = 30,
+        min_calls: int = 5,
+        cooldown: float = 10,
+        half_open_max_calls: int = 1,
+        expected_exceptions: tuple = (sqlite3.Error,),
+    ):
+        self.failure_threshold = failure_threshold
+        self.window = window
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.half_open_max_calls = half_open_max_calls
+        self.expected_exceptions = expected_exceptions
+
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        # (timestamp, failed) pairs for the calls inside the window
+        self._outcomes = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """Current state, moving from open to half-open once the cooldown is over."""
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def _current_state(self, now: float) -> str:
+        if self._state == OPEN and now - self._opened_at >= self.cooldown:
+            logging.info("Circuit cooldown elapsed, switching to half-open")
+            self._state = HALF_OPEN
+            self._half_open_calls = 0
+        return self._state
+
+    def _trim(self, now: float) -> None:
+        while self._outcomes and now - self._outcomes[0][0] > self.window:
+            self._outcomes.popleft()
+
+    def before_call(self) -> None:
+        """Reserve a slot for a call or raise CircuitOpenError."""
+        with self._lock:
+            state = self._current_state(time.monotonic())
+            if state == OPEN:
+                raise CircuitOpenError("Circuit is open, call rejected")
+            if state == HALF_OPEN:
+                if self._half_open_calls >= self.half_open_max_calls:
+                    raise CircuitOpenError("Circuit is half-open, trial call in flight")
+                self._half_open_calls += 1
+
+    def record_success(self) -> None:
+        """Record a successful call, closing the circuit after a good trial call."""
+        with self._lock:
+            now = time.monotonic()
+            if self._state == HALF_OPEN:
+                logging.info("Trial call succeeded, closing circuit")
+                self._state = CLOSED
+                self._outcomes.clear()
+            self._outcomes.append((now, False))
+            self._trim(now)
+
+    def record_failure(self) -> None:
+        """Record a failed call and open the circuit if needed."""
+        with self._lock:
+            now = time.monotonic()
+            if self._state == HALF_OPEN:
+                self._trip(now)
+                return
+
+            self._outcomes.append((now, True))
+            self._trim(now)
+
+            total = len(self._outcomes)
+            failures = sum(1 for _, failed in self._outcomes if failed)
+            if total >= self.min_calls and failures / total >= self.failure_threshold:
+                self._trip(now)
+
+    def _trip(self, now: float) -> None:
+        logging.error("Opening circuit for %s seconds", self.cooldown)
+        self._state = OPEN
+        self._opened_at = now
+        self._outcomes.clear()
+
+    def release(self) -> None:
+        """Give back a half-open slot when the call failed for an unrelated reason."""
+        with self._lock:
+            if self._state == HALF_OPEN and self._half_open_calls:
+                self._half_open_calls -= 1
+
+    def reset(self) -> None:
+        """Force the circuit back to closed."""
+        with self._lock:
+            self._state = CLOSED
+            self._outcomes.clear()
+            self._half_open_calls = 0
+
+
+def circuit_breaker(breaker: CircuitBreaker = None, **options):
+    """
+    Decorator to short-circuit calls while the database is unhealthy.
+    Pass a shared CircuitBreaker to guard several functions with the same circuit,
+    otherwise one is created from the keyword options.
+    Place it above retry_on_failure so an open circuit skips the retries.
+    """
+    if breaker is None:
+        breaker = CircuitBreaker(**options)
+
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                breaker.before_call()
+                try:
+                    result = await func(*args, **kwargs)
+                except breaker.expected_exceptions:
+                    breaker.record_failure()
+                    raise
+                except BaseException:
+                    breaker.release()
+                    raise
+                breaker.record_success()
+                return result
+
+            async_wrapper.breaker = breaker
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            breaker.before_call()
+            try:
+                result = func(*args, **kwargs)
+            except breaker.expected_exceptions:
+                breaker.record_failure()
+                raise
+            except BaseException:
+                breaker.release()
+                raise
+            breaker.record_success()
+            return result
+
+        wrapper.breaker = breaker
+        return wrapper
+
+    return decorator
+
+
+@circuit_breaker(failure_threshold=0.5, window=30, min_calls=3, cooldown=5)
+@retry_on_failure(retries=3, delay=1)
+@with_db_connection
+def fetch_users_with_breaker(conn: sqlite3.Connection):
+    """
+    Fetch users from the database, failing fast while the circuit is open.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM users LIMIT 5")
+    return cursor.fetchall()
+
+
+#### fetch users through the circuit breaker
+
+users = fetch_users_with_breaker()
+print(users)
+print(fetch_users_with_breaker.breaker.state)
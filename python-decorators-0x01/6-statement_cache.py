@@ -0,0 +1,145 @@
+"""This module provides a decorator that reuses connections so SQLite can serve repeated queries from its prepared statement cache"""
+
+import functools
+import logging
+import re
+import sqlite3
+import threading
+import timeit
+
+with_db_connection = __import__("1-with_db_connection").with_db_connection
+userdb = __import__("1-with_db_connection").userdb
+
+# A value compared against a column, e.g. name = 'x' or age > 25, should be a bound
+# parameter. Other constants (LIMIT 10, IS NULL, LIKE ? || '%') are part of the
+# statement. A quoted string is matched whole, so operators inside it are skipped
+INLINE_LITERAL = re.compile(
+    r"'(?:[^']|'')*'"
+    r"|(?P<comparison>(?:=|<>|!=|<=|>=|<|>)\s*(?:'(?:[^']|'')*'|-?\d+(?:\.\d+)?\b))"
+)
+
+_local = threading.local()
+
+
+class UnboundParameterError(sqlite3.ProgrammingError):
+    """Raised when a query has literal values instead of ? placeholders."""
+
+
+@functools.lru_cache(maxsize=512)
+def normalize_query(query: str) -> str:
+    """
+    Collapse whitespace and drop the trailing semicolon, so the same query
+    written differently maps to the same entry of the statement cache.
+    """
+    normalized = " ".join(query.split()).rstrip(";").rstrip()
+    if any(match.group("comparison") for match in INLINE_LITERAL.finditer(normalized)):
+        raise UnboundParameterError(
+            f"Pass literal values as parameters with ? placeholders: {normalized}"
+        )
+    return normalized
+
+
+class StatementCacheCursor(sqlite3.Cursor):
+    """Cursor that normalizes queries and enforces parameter binding."""
+
+    def execute(self, sql, parameters=()):
+        return super().execute(normalize_query(sql), parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return super().executemany(normalize_query(sql), seq_of_parameters)
+
+
+class StatementCacheConnection(sqlite3.Connection):
+    """Connection whose cursors go through StatementCacheCursor."""
+
+    def cursor(self, factory=StatementCacheCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def get_cached_connection(cached_statements: int = 256) -> sqlite3.Connection:
+    """Return the connection of the current thread, opening it on first use."""
+    conn = getattr(_local, "connection", None)
+    if conn is None:
+        conn = sqlite3.connect(
+            userdb,
+            factory=StatementCacheConnection,
+            cached_statements=cached_statements,
+        )
+        logging.info(
+            "Connection to %s opened with %d cached statements",
+            userdb,
+            cached_statements,
+        )
+        _local.connection = conn
+    return conn
+
+
+def close_cached_connection() -> None:
+    """Close the connection of the current thread."""
+    conn = getattr(_local, "connection", None)
+    if conn is not None:
+        conn.close()
+        _local.connection = None
+
+
+def with_statement_cache(cached_statements: int = 256):
+    """
+    Decorator to pass a long-lived per-thread connection as the first argument.
+    Unlike with_db_connection the connection stays open between calls,
+    so SQLite keeps up to cached_statements prepared statements around.
+    Like with_db_connection closing its connection, changes the call did not
+    commit (e.g. with transactional) are rolled back when it returns.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if args and isinstance(args[0], sqlite3.Connection):
+                return func(*args, **kwargs)
+
+            conn = get_cached_connection(cached_statements)
+            # Nested calls share the connection, the outermost one ends its transaction
+            depth = getattr(_local, "depth", 0)
+            _local.depth = depth + 1
+            try:
+                return func(conn, *args, **kwargs)
+            finally:
+                _local.depth = depth
+                if depth == 0 and conn.in_transaction:
+                    conn.rollback()
+                    logging.info("Uncommitted changes rolled back")
+
+        return wrapper
+
+    return decorator
+
+
+@with_db_connection
+def get_user_by_id(conn, user_id):
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
+    return cursor.fetchone()
+
+
+@with_statement_cache(cached_statements=256)
+def get_user_by_id_cached(conn, user_id):
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
+    return cursor.fetchone()
+
+
+#### compare the cost of repeated lookups
+calls = 1000
+fresh = timeit.timeit(lambda: get_user_by_id(user_id=1), number=calls)
+cached = timeit.timeit(lambda: get_user_by_id_cached(user_id=1), number=calls)
+
+print(f"with_db_connection:   {fresh / calls * 1e6:.1f} us per call")
+print(f"with_statement_cache: {cached / calls * 1e6:.1f} us per call")
+
+close_cached_connection()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Tests for the query normalization of 6-statement_cache.py"""
+
+import contextlib
+import io
+import os
+import sqlite3
+import tempfile
+import unittest
+
+statement_cache = None
+
+
+def setUpModule():
+    """
+    Import the module from a scratch directory: importing it runs its
+    example against users.db and logs to logs/ in the working directory.
+    """
+    global statement_cache
+    directory = tempfile.TemporaryDirectory()
+    unittest.addModuleCleanup(directory.cleanup)
+    unittest.addModuleCleanup(os.chdir, os.getcwd())
+    os.chdir(directory.name)
+    os.mkdir("logs")
+    with sqlite3.connect("users.db") as connection:
+        connection.execute(
+            "CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, email TEXT, age INTEGER)"
+        )
+        connection.execute("INSERT INTO users VALUES (1, 'Alice', 'alice@example.com', 30)")
+    connection.close()
+    with contextlib.redirect_stdout(io.StringIO()):
+        statement_cache = __import__("6-statement_cache")
+
+
+class TestNormalizeQuery(unittest.TestCase):
+    """Tests the normalize_query function"""
+
+    def test_normalizes_whitespace(self):
+        """Differently written queries map to the same statement"""
+        self.assertEqual(
+            statement_cache.normalize_query("SELECT *\n  FROM users\tWHERE id = ?;"),
+            "SELECT * FROM users WHERE id = ?",
+        )
+
+    def test_constants_allowed(self):
+        """Constants that are not compared against a column are accepted"""
+        queries = [
+            "SELECT * FROM users LIMIT 10",
+            "SELECT * FROM users ORDER BY id LIMIT 10 OFFSET 20",
+            "SELECT * FROM users WHERE email IS NULL",
+            "SELECT * FROM users WHERE name LIKE ? || '%'",
+            "SELECT * FROM users WHERE name LIKE '%a=1%'",
+            "SELECT COALESCE(name, 'unknown') FROM users WHERE id = ?",
+            "SELECT * FROM users u JOIN users v ON u.id = v.id WHERE u.age >= ?",
+        ]
+        for query in queries:
+            with self.subTest(query=query):
+                self.assertEqual(statement_cache.normalize_query(query), query)
+
+    def test_inline_literals_rejected(self):
+        """Values compared against a column must be bound parameters"""
+        queries = [
+            "SELECT * FROM users WHERE id = 1",
+            "SELECT * FROM users WHERE age >= -2.5",
+            "SELECT * FROM users WHERE name = 'Alice'",
+            "SELECT * FROM users WHERE name <> 'O''Brien' AND id = ?",
+        ]
+        for query in queries:
+            with self.subTest(query=query):
+                with self.assertRaises(statement_cache.UnboundParameterError):
+                    statement_cache.normalize_query(query)
+
+
+if __name__ == "__main__":
+    unittest.main()
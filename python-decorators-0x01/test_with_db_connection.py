@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Tests for the async connection pool of 1-with_db_connection.py"""
+
+import asyncio
+import contextlib
+import io
+import os
+import sqlite3
+import tempfile
+import unittest
+
+with_db_connection = None
+
+
+def setUpModule():
+    """
+    Import the module from a scratch directory: importing it runs its
+    example against users.db and logs to logs/ in the working directory.
+    """
+    global with_db_connection
+    directory = tempfile.TemporaryDirectory()
+    unittest.addModuleCleanup(directory.cleanup)
+    unittest.addModuleCleanup(os.chdir, os.getcwd())
+    os.chdir(directory.name)
+    os.mkdir("logs")
+    with sqlite3.connect("users.db") as connection:
+        connection.execute(
+            "CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, email TEXT, age INTEGER)"
+        )
+        connection.execute("INSERT INTO users VALUES (1, 'Alice', 'alice@example.com', 30)")
+    connection.close()
+    with contextlib.redirect_stdout(io.StringIO()):
+        with_db_connection = __import__("1-with_db_connection")
+
+
+class TestAsyncPool(unittest.TestCase):
+    """Tests the per event loop pool of aiosqlite connections"""
+
+    def test_pool_per_event_loop(self):
+        """A connection released under one loop is not handed out under another"""
+
+        async def checkout():
+            conn = await with_db_connection.acquire_async_connection()
+            await with_db_connection.release_async_connection(conn)
+            return conn
+
+        async def in_other_loop():
+            try:
+                return await checkout()
+            finally:
+                await with_db_connection.close_async_pool()
+
+        async def in_first_loop():
+            try:
+                first = await checkout()
+                self.assertIs(await checkout(), first)
+                # A second loop, run in a thread while this one holds its pool
+                other = await asyncio.to_thread(asyncio.run, in_other_loop())
+                self.assertIsNot(other, first)
+                self.assertIs(await checkout(), first)
+            finally:
+                await with_db_connection.close_async_pool()
+
+        asyncio.run(in_first_loop())
+
+
+if __name__ == "__main__":
+    unittest.main()